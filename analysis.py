@@ -1,15 +1,58 @@
+# nltk, matplotlib.pyplot, seaborn and tqdm are slow to import, so they're imported by the functions that use them
 from html_parser import load_df
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-from nltk.corpus import cmudict
-from nltk.tokenize import WhitespaceTokenizer
 import string
-from itertools import product as itertools_product
-from tqdm import tqdm
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import hashlib
+import os
+import pickle
+
+NLTK_RESOURCES = {'vader_lexicon': 'sentiment/vader_lexicon.zip',
+                  'cmudict': 'corpora/cmudict'}
+# Caches shared by every chat, kept in the parsed_data folder next to this module whatever the working directory is
+CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parsed_data')
+SENTIMENT_CACHE_PATH = os.path.join(CACHE_FOLDER, 'sentiment_cache.pkl')
+SENTIMENT_CHUNK_SIZE = 5000
+STRESS_TABLE_CACHE_PATH = os.path.join(CACHE_FOLDER, 'stress_patterns.pkl')
+# Stress patterns of supported meters, where 0 is an unstressed syllable and 1 is a stressed syllable
+METERS = {'iambic pentameter': '01' * 5,
+          'iambic tetrameter': '01' * 4,
+          'trochaic tetrameter': '10' * 4,
+          'anapestic tetrameter': '001' * 4,
+          'dactylic hexameter': '100' * 6}
+
+# Columns generate_author_stats can compute
+AUTHOR_STATS_COLUMNS = ['Total sends', 'Likes given', 'Likes received', 'Word count', 'Average sentiment', 'Total runs',
+                        'Longest run', 'Average run length', 'Total messages', 'Total links', 'Total images', 'Total posts',
+                        'Total videos', 'Total audios', 'Replies sent', 'Median reply time']
+# Edges (in minutes) of the buckets reply_time_histogram counts reply times in, the last bucket being open ended
+REPLY_TIME_BINS = [0, 1, 5, 15, 60, 60 * 6, 60 * 24]
+REPLY_TIME_PERCENTILES = [0.25, 0.5, 0.75, 0.9]
+
+_available_nltk_resources = set()
+_sentiment_caches = {}
+_stress_tables = {}
+_sia = None
+
+
+class AnalysisCancelled(Exception):
+    # Raised from a progress callback to stop an analysis part way through
+    pass
+
+def track(iterable, desc: str, total: int = None, progress=None):
+    # Wraps an iterable to report progress, through the progress callback if one is given or a tqdm bar otherwise.
+    # progress is called as progress(done, total, desc) and may raise AnalysisCancelled to stop the analysis.
+    if progress is None:
+        from tqdm import tqdm
+        yield from tqdm(iterable, desc=desc, total=total)
+        return
+    total = len(iterable) if total is None else total
+    progress(0, total, desc)
+    for done, item in enumerate(iterable, 1):
+        yield item
+        progress(done, total, desc)
 
 
 def remove_empty_messages(df):
@@ -21,76 +64,170 @@ def count_words(t):
     else:
         return 0
 
-def generate_author_stats(groupchat, columns: list) -> pd.DataFrame:
+def run_task_graph(tasks: dict, workers: int = None) -> dict:
+    """
+    Runs a graph of tasks on a thread pool, starting each task as soon as the tasks it depends on have finished,
+    and returns a dict of each task's result.
 
+    tasks maps each task's name to a tuple of the names of the tasks it depends on and a function, which is called
+    with the results of those tasks in order. If a task raises an exception, tasks that haven't started are dropped
+    and the exception is raised once the running tasks have finished.
+    """
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while pending or running:
+            ready = [name for name, (inputs, _) in pending.items() if all(i in results for i in inputs)]
+            for name in ready:
+                inputs, fn = pending.pop(name)
+                running[executor.submit(fn, *(results[i] for i in inputs))] = name
+            if not running:
+                raise ValueError(f'Tasks {list(pending)} depend on each other or on tasks that don\'t exist')
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return results
+
+def message_word_counts(groupchat, progress=None, workers=None) -> pd.Series:
+    # Number of words in each message, kept until the content changes
+    return groupchat.cached('message_word_counts', ['content'], lambda: groupchat.messages['content'].map(count_words))
+
+def runs_data(groupchat, progress=None, workers=None) -> dict:
+    # make_runs_data, kept until the authors change
+    return groupchat.cached('runs_data', ['author'], lambda: make_runs_data(groupchat))
+
+# Intermediate results shared by author stats, each called as fn(groupchat, progress=progress, workers=workers)
+# and cached by itself
+STAT_INPUTS = {'message_word_counts': message_word_counts,
+               'sentiment_scores': lambda groupchat, progress=None, workers=None: sentiment_scores(groupchat, workers=workers, progress=progress),
+               'runs_data': runs_data,
+               'reply_times': lambda groupchat, progress=None, workers=None: reply_times(groupchat)}
+
+# Author stats, each called with the groupchat and the results of its STAT_INPUTS, and returning a Series or dict
+# of its value for each author
+def total_sends(groupchat):
+    return groupchat.messages['author'].value_counts()
+
+def total_of_meta(meta: str):
+    # Counts the messages of one meta type, e.g. total_of_meta('image') counts images sent
+    def total(groupchat):
+        m = groupchat.messages
+        return m.loc[m['meta'] == meta, 'author'].value_counts()
+    return total
+
+def likes_given(groupchat):
+    return groupchat.likes['liker'].value_counts()
+
+def likes_received(groupchat):
+    # Maps post_ids in m to their number of likes in l, and totals them by author
     m = groupchat.messages
-    l = groupchat.likes
-    authors = groupchat.authors
-
-    # Initializing the dataframe with unique authors
-    author_stats = pd.DataFrame(authors, columns=['author'])
-    cols = {}
-
-    # Total Sends: Counting the number of sends (rows) for each author in m
-    if "Total sends" in columns:
-        cols['total_sends'] = m['author'].value_counts()
-
-    # Aggregating total message types by counting on the 'meta' column of m
-    for meta in ['message', 'link', 'image', 'post', 'video', 'audio']:
-        if f'Total {meta}s' in columns:
-            cols[f'total_{meta}s'] = m[m['meta'] == meta]['author'].value_counts().fillna(0).astype(int)
-
-    # Likes Given: Counting the number of likes given by each author in l
-    if 'Likes given' in columns:
-        cols['likes_given'] = l['liker'].value_counts().fillna(0).astype(int)
-
-    # Likes Received: Calculating the number of likes received for each author's posts
-    # Mapping post_ids in m to their corresponding likes in l
-    if 'Likes received' in columns:
-        post_likes = l['post_id'].value_counts()
-        m['likes_received'] = m['post_id'].map(post_likes).fillna(0)
-        cols['likes_received'] = m.groupby('author')['likes_received'].sum().astype(int)
-
-    # Word count
-    if 'Word count' in columns:
-        m['word_count'] = m['content'].apply(count_words)
-        cols['total_words'] = m.groupby('author')['word_count'].sum().astype(int)
-
-    # Average sentiment
-    if 'Average sentiment' in columns:
-        perform_sentiment_analysis(groupchat)
-        cols['average_sentiment'] = m.groupby('author')['sentiment_score'].mean()
-
-    # Run data
-    if 'Total runs' in columns or 'Longest run' in columns or 'Average run length' in columns:
-        runs_data = make_runs_data(groupchat)
-        if 'Total runs' in columns:
-            cols['total_runs'] = {author: data['total_runs'] for author, data in runs_data.items()}
-        if 'Longest run' in columns:
-            cols['longest_run'] = {author: data['longest_run'] for author, data in runs_data.items()}
-        if 'Average run length' in columns:
-            cols['average_run_length'] = {author: data['average_run_length'] for author, data in runs_data.items()}
-
-    # Merging all these counts into the author_stats dataframe
-    author_stats = author_stats.set_index('author')
-    for k, v in cols.items():
-        if k in ['total_sends', 'likes_given', 'likes_received', 'total_words', 'total_messages', 'total_links', 'total_images', 'total_posts', 'total_videos', 'total_audios', 'total_runs', 'longest_run']:
-            author_stats[k] = author_stats.index.map(v).fillna(0).astype(int)
-        else:
-            author_stats[k] = author_stats.index.map(v).fillna(0)
-
-    # Filling NaN values with 0 as they indicate no activity in that category
-    author_stats.fillna(0, inplace=True)
+    post_likes = groupchat.likes['post_id'].value_counts()
+    return m['post_id'].map(post_likes).fillna(0).groupby(m['author'], observed=True).sum()
+
+def total_words(groupchat, word_counts):
+    return word_counts.groupby(groupchat.messages['author'], observed=True).sum()
+
+def average_sentiment(groupchat, scores):
+    return scores.groupby(groupchat.messages['author'], observed=True).mean()
+
+def replies_sent(groupchat, replies):
+    return replies['replier'].value_counts()
+
+def median_reply_time(groupchat, replies):
+    # Median minutes each author takes to reply, see reply_times
+    replies = replies[replies['minutes'].notna()]
+    authors = replies['replier'].cat.categories
+    _, medians = grouped_percentiles(replies['replier'].cat.codes.to_numpy(np.int64), replies['minutes'].to_numpy(),
+                                     len(authors), [0.5])
+    return pd.Series(medians[:, 0], index=authors)
+
+def runs_stat(key: str):
+    # Picks one value out of each author's runs data, e.g. runs_stat('longest_run')
+    def stat(groupchat, runs):
+        return {author: data[key] for author, data in runs.items()}
+    return stat
+
+# Each author stat's column name in generate_author_stats' output, the groupchat columns it's computed from,
+# the STAT_INPUTS it needs, whether it's a whole number, and the function computing it
+AUTHOR_STATS = {'Total sends': ('total_sends', ['author'], [], True, total_sends),
+                **{f'Total {meta}s': (f'total_{meta}s', ['author', 'meta'], [], True, total_of_meta(meta))
+                   for meta in ['message', 'link', 'image', 'post', 'video', 'audio']},
+                'Likes given': ('likes_given', ['liker'], [], True, likes_given),
+                'Likes received': ('likes_received', ['author', 'post_id'], [], True, likes_received),
+                'Word count': ('total_words', ['author', 'content'], ['message_word_counts'], True, total_words),
+                'Average sentiment': ('average_sentiment', ['author', 'content'], ['sentiment_scores'], False, average_sentiment),
+                'Total runs': ('total_runs', ['author'], ['runs_data'], True, runs_stat('total_runs')),
+                'Longest run': ('longest_run', ['author'], ['runs_data'], True, runs_stat('longest_run')),
+                'Average run length': ('average_run_length', ['author'], ['runs_data'], False, runs_stat('average_run_length')),
+                'Replies sent': ('replies_sent', ['author', 'meta', 'timestamp'], ['reply_times'], True, replies_sent),
+                'Median reply time': ('median_reply_time', ['author', 'meta', 'timestamp'], ['reply_times'], False, median_reply_time)}
+
+def generate_author_stats(groupchat, columns: list, progress=None, workers: int = None, start=None, end=None) -> pd.DataFrame:
+    """
+    Returns a df with the selected stats (see AUTHOR_STATS) for each author.
+
+    Stats are computed concurrently on a thread pool of the given number of workers (which sentiment scoring also
+    uses as the size of its process pool, so workers=1 computes everything in this process), as a graph of tasks where
+    stats sharing an input (e.g. the three run stats) wait for it to be computed once, so slow stats like sentiment
+    run alongside the rest. Each stat is cached on the groupchat until one of the columns it's computed from changes,
+    e.g. renaming an author recomputes the stats but reuses each message's word count and sentiment score.
+    The messages and likes dfs aren't modified. progress is an optional callback, see track().
+    start and end optionally limit the stats to messages sent in that range, see GroupChat.between.
+    """
+    groupchat = groupchat.between(start, end)
+    report = progress or (lambda done, total, desc: None)
+    selected = {column: stat for column, stat in AUTHOR_STATS.items() if column in columns}
+
+    def stat_task(name, dependencies, compute):
+        return lambda *inputs: groupchat.cached(f'author_stats.{name}', dependencies, lambda: compute(groupchat, *inputs))
+
+    def input_task(fn):
+        return lambda: fn(groupchat, progress=progress, workers=workers)
+
+    tasks = {}
+    for column, (name, dependencies, inputs, _, compute) in selected.items():
+        if groupchat.is_cached(f'author_stats.{name}', dependencies):
+            inputs = ()  # The cached result is reused, so its inputs aren't needed
+        tasks[column] = (inputs, stat_task(name, dependencies, compute))
+        tasks.update({i: ((), input_task(STAT_INPUTS[i])) for i in inputs})
+    report(0, 1, 'Computing author stats')
+    results = run_task_graph(tasks, workers)
+
+    author_stats = pd.DataFrame(index=pd.Index(groupchat.authors, name='author'))
+    for column, (name, _, _, is_int, _) in selected.items():
+        # Filling NaN values with 0 as they indicate no activity in that category
+        author_stats[name] = author_stats.index.map(results[column]).fillna(0)
+        if is_int:
+            author_stats[name] = author_stats[name].astype(int)
 
     return author_stats
 
 
+def activity_cube(groupchat) -> pd.DataFrame:
+    # Returns a df with the number of messages sent per hour, author and meta type. It's built once per groupchat
+    # (until its columns change) so every activity graph can be computed by rolling it up instead of regrouping m.
+    def build():
+        m = groupchat.messages
+        hours = m['timestamp'].dt.floor('h').rename('hour')
+        cube = m.groupby([hours, 'author', 'meta'], observed=True, dropna=False).size()
+        return cube[cube > 0].rename('count').reset_index()
+    return groupchat.cached('activity_cube', ['timestamp', 'author', 'meta'], build)
+
 # Activity over time
-def activity_over_time(groupchat, period='M'):
-    m = groupchat.messages
-    m['timestamp'] = pd.to_datetime(m['timestamp'])
-    activity = m.set_index('timestamp').groupby([pd.Grouper(freq=period), 'author']).count()['content']
-    return activity.unstack().fillna(0).astype(int)
+def activity_over_time(groupchat, period='M', metas: list = None, start=None, end=None):
+    # Returns a df with the number of messages each author (columns) sent in each period (rows).
+    # metas optionally limits the count to those message types, e.g. ['message'], and start and end to a time range.
+    cube = activity_cube(groupchat.between(start, end))
+    if metas is not None:
+        cube = cube[cube['meta'].isin(metas)]
+    activity = cube.groupby([pd.Grouper(key='hour', freq=period), 'author'], observed=True)['count'].sum()
+    activity = activity.unstack().fillna(0).astype(int)
+    activity.index.name = 'timestamp'
+    return activity
 def detect_time_period(index):
     """
     Detects the time period (daily, monthly, etc.) of the provided datetime index.
@@ -124,7 +261,27 @@ def format_x_labels_universal(index, period):
         labels = [label.strftime('%b %Y') for label in index]
 
     return labels
-def plot_activity_over_time(activity_data, authors=None, label_frequency=4):
+def messages_per_author(groupchat, start=None, end=None) -> pd.Series:
+    # Number of messages each author sent, most first. author's categories include people who've only liked messages
+    # (and in a date range, anyone who didn't send a message in it), so those are left out rather than counted as 0.
+    return groupchat.between(start, end).messages['author'].cat.remove_unused_categories().value_counts()
+
+def draw_messages_per_user(fig, message_counts):
+    # Draws a bar chart of message counts per author onto fig, replacing anything already on it
+    fig.clear()
+    ax = fig.add_subplot(111)
+    ax.bar(message_counts.index, message_counts.values)
+    ax.set_xlabel('User')
+    ax.set_ylabel('Number of Messages')
+    ax.set_title('Messages per User')
+    fig.tight_layout()
+
+def draw_activity_over_time(fig, activity_data, authors='all', label_frequency=4):
+    # Draws activity_over_time data onto fig. authors is 'all' for the chat's total, a list of authors to compare,
+    # or None for every author.
+    fig.clear()
+    ax = fig.add_subplot(111)
+
     if authors == 'all':
         data_to_plot = activity_data.sum(axis=1)
     elif authors is not None:
@@ -140,34 +297,118 @@ def plot_activity_over_time(activity_data, authors=None, label_frequency=4):
         if i % label_frequency != 0 and period != 'Y':
             labels[i] = ''
 
-    data_to_plot.plot(kind='bar', figsize=(15, 7))
-    plt.title('Activity Over Time')
-    plt.xlabel('Time Period')
-    plt.ylabel('Number of Messages')
+    # Plotting using the ax object
+    data_to_plot.plot(kind='bar', ax=ax, figsize=(15, 7))
+
+    ax.set_title('Activity Over Time')
+    ax.set_xlabel('Time Period')
+    ax.set_ylabel('Number of Messages')
 
     # Set the custom labels with reduced frequency
-    plt.xticks(ticks=range(len(labels)), labels=labels, rotation=45)
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=45)
 
     if authors != 'all':
-        plt.legend(title='Authors')
+        ax.legend(title='Authors')
+
+    fig.tight_layout()
+    fig.subplots_adjust(left=0.15, right=0.9, top=0.9, bottom=0.1)
 
-    plt.tight_layout()
+def plot_activity_over_time(activity_data, authors=None, label_frequency=4):
+    import matplotlib.pyplot as plt
+    draw_activity_over_time(plt.figure(), activity_data, authors, label_frequency)
     plt.show()
 
 
-def perform_sentiment_analysis(groupchat) -> None:
-    # Adds sentiment score column to m.
-    m = groupchat.messages
-    if 'sentiment_score' in m: return
+def ensure_nltk_resource(name: str) -> bool:
+    # Makes sure an nltk resource is installed, only trying to download it if it can't be found locally.
+    # Returns whether the resource is available, so callers work offline as long as it was downloaded once.
+    if name in _available_nltk_resources:
+        return True
+    import nltk
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+    except LookupError:
+        if not nltk.download(name, quiet=True, raise_on_error=False):
+            return False
+    _available_nltk_resources.add(name)
+    return True
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf8'), digest_size=16).hexdigest()
+
+def load_sentiment_cache(cache_path: str) -> dict:
+    # Loads the on-disk cache of sentiment scores, keyed by a hash of each message's content
+    if cache_path not in _sentiment_caches:
+        cache = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        _sentiment_caches[cache_path] = cache
+    return _sentiment_caches[cache_path]
+
+def save_sentiment_cache(cache: dict, cache_path: str):
+    # Several processes (e.g. ChatCorpus workers) can share a cache file, so scores other processes saved since it
+    # was loaded are kept, and the file is replaced in one step so it's never left half written
+    if not cache_path:
+        return
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            for key, score in pickle.load(f).items():
+                cache.setdefault(key, score)
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(cache, f)
+    os.replace(temp_path, cache_path)
+
+def init_sentiment_worker():
+    global _sia
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    _sia = SentimentIntensityAnalyzer()
+
+def score_sentiment_chunk(texts: list) -> list:
+    if _sia is None:
+        init_sentiment_worker()
+    return [_sia.polarity_scores(text)['compound'] for text in texts]
+
+def sentiment_scores(groupchat, cache_path: str = SENTIMENT_CACHE_PATH, workers: int = None, progress=None) -> pd.Series:
+    # Returns the sentiment score of each message, kept on the groupchat until the content changes.
+    # Each distinct message is only scored once: scores are kept in an on-disk cache keyed by a hash of the content,
+    # and messages missing from the cache are scored in chunks across a process pool.
+    return groupchat.cached('sentiment_scores', ['content'],
+                            lambda: score_messages(groupchat.messages['content'], cache_path, workers, progress))
+
+def score_messages(content: pd.Series, cache_path: str = SENTIMENT_CACHE_PATH, workers: int = None, progress=None) -> pd.Series:
+    if not ensure_nltk_resource('vader_lexicon'):
+        raise LookupError('The nltk vader_lexicon is not installed and could not be downloaded')
+
+    cache = load_sentiment_cache(cache_path)
+    texts = pd.unique(content.dropna())
+    keys = [content_hash(text) for text in texts]
+    missing = [text for text, key in zip(texts, keys) if key not in cache]
+
+    if missing:
+        chunks = [missing[i:i + SENTIMENT_CHUNK_SIZE] for i in range(0, len(missing), SENTIMENT_CHUNK_SIZE)]
+        if len(chunks) == 1 or workers == 1:
+            scores = [score_sentiment_chunk(chunk) for chunk in track(chunks, "Analyzing sentiment", progress=progress)]
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=init_sentiment_worker)
+            try:
+                scores = list(track(executor.map(score_sentiment_chunk, chunks), "Analyzing sentiment", len(chunks), progress))
+            finally:
+                # Drops any chunks that haven't started if the analysis was cancelled
+                executor.shutdown(cancel_futures=True)
+        for chunk, chunk_scores in zip(chunks, scores):
+            cache.update(zip((content_hash(text) for text in chunk), chunk_scores))
+        save_sentiment_cache(cache, cache_path)
 
-    nltk.download('vader_lexicon')
-    sia = SentimentIntensityAnalyzer()
-    def get_sentiment_score(message):
-        if pd.isna(message):
-            return None
-        return sia.polarity_scores(message)['compound']
-    tqdm.pandas(desc="Analyzing sentiment")
-    m['sentiment_score'] = m['content'].progress_apply(get_sentiment_score)
+    scores = {text: cache[key] for text, key in zip(texts, keys)}
+    return content.map(scores)
+
+def perform_sentiment_analysis(groupchat, cache_path: str = SENTIMENT_CACHE_PATH, workers: int = None, progress=None) -> None:
+    # Adds sentiment score column to m
+    groupchat.messages['sentiment_score'] = sentiment_scores(groupchat, cache_path, workers, progress)
 
 
 def my_tokenize(message, tokenizer, spellchecker=None) -> list:
@@ -182,173 +423,342 @@ def my_tokenize(message, tokenizer, spellchecker=None) -> list:
         return tokens
 
 
-def perform_iambic_pentameter(groupchat, check_spelling=False) -> None:
-    """
-    Adds an "is_iambic_pentameter" column to m. Setting check_spelling to True corrects misspellings, but is extremely slow and not recommended.
+def cmu_to_stress(pronunciations) -> tuple:
+    # Turns cmu data for a word into a tuple of its possible stress patterns
+    out = set()
+    is_one_syllable = None
+    for pronunciation in pronunciations:
+        stress = ''
+        for phoneme in pronunciation:
+            if '0' in phoneme or '1' in phoneme:
+                stress += phoneme[-1]
+            elif '2' in phoneme:
+                stress += '1'
+        out.add(stress)
+        if len(pronunciation) == 1:
+            is_one_syllable = True
+    if is_one_syllable:
+        out.add('1')
+        out.add('0')
+    return tuple(sorted(out))
+
+def load_stress_table(cache_path: str = STRESS_TABLE_CACHE_PATH) -> dict:
+    # Returns a dict mapping each word in cmudict to its possible stress patterns.
+    # The table is built once and cached to disk, since converting all of cmudict is slow.
+    if cache_path in _stress_tables:
+        return _stress_tables[cache_path]
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            table = pickle.load(f)
+    else:
+        if not ensure_nltk_resource('cmudict'):
+            raise LookupError('The nltk cmudict corpus is not installed and could not be downloaded')
+        from nltk.corpus import cmudict
+        table = {word: cmu_to_stress(pronunciations) for word, pronunciations in cmudict.dict().items()}
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(table, f)
+    _stress_tables[cache_path] = table
+    return table
+
+def matches_meter(words: list, stress_table: dict, pattern: str) -> bool:
     """
-    m = groupchat.messages
-    def is_iambic_pentameter(message, cmu, tokenizer, spellchecker=None) -> bool:
-        """
-        Returns if a message follows iambic pentameter.
-
-        Parameters:
-            message (str)
-            cmu (dict): cmudict containing pronunciation information
-            tokenizer (WhitespaceTokenizer): Tokenizer object
-            spellchecker (SpellChecker or None): Optional spellchecker for input message
-        """
-        if spellchecker:
-            from spellchecker import SpellChecker
-
-        if not isinstance(message, str):
-            return False
+    Returns if a sequence of words can be read with the given stress pattern.
 
-        def cmu_to_stress(word):
-            # Turns cmu data for a word into a list of possible stress patterns
-            out = set()
-            is_one_syllable = None
-            for pronunciation in word:
-                stress = ''
-                for phoneme in pronunciation:
-                    if '0' in phoneme or '1' in phoneme:
-                        stress += phoneme[-1]
-                    elif '2' in phoneme:
-                        stress += '1'
-                out.add(stress)
-                if len(pronunciation) == 1:
-                    is_one_syllable = True
-            if is_one_syllable:
-                out.add('1')
-                out.add('0')
-            return list(out)
-        
-        def combine_lists(lists):
-            # Combines words into all possible combinations of each word's stress patterns
-            combined = [''.join(items) for items in itertools_product(*lists)]
-            return combined
-        
-        def possible_stress_patterns(stresses):
-            return set(combine_lists(stresses))
-
-        text = my_tokenize(message, tokenizer, spellchecker)
-        if len(text) > 10:
-            return False
-        try:
-            text_pronunciation = [cmu[x] for x in text]
-        except:
+    Rather than expanding every combination of the words' stress patterns, this tracks the set of positions in
+    the pattern that can be reached after each word, dropping any reading that stops matching the pattern.
+
+    Parameters:
+        words (list): Tokenized message
+        stress_table (dict): Mapping of words to their possible stress patterns, from load_stress_table
+        pattern (str): Stress pattern to match, e.g. '0101010101' for iambic pentameter
+    """
+    if len(words) > len(pattern):
+        return False
+    positions = {0}
+    for word in words:
+        stresses = stress_table.get(word)
+        if stresses is None:
             return False
-        stresses = [cmu_to_stress(x) for x in text_pronunciation]
-        possible_patterns = possible_stress_patterns(stresses)
-        if '0101010101' in possible_patterns:
-            return True
-        else: 
+        positions = {p + len(s) for p in positions for s in stresses if pattern.startswith(s, p)}
+        if not positions:
             return False
+    return len(pattern) in positions
 
-    nltk.download('cmudict') 
-    nltk.download('punkt')
-    cmu = cmudict.dict()
-    spellchecker = SpellChecker() if check_spelling else None
-    tokenizer = WhitespaceTokenizer()
-    tqdm.pandas(desc='Checking for iambic pentameter')
-    m['is_iambic_pentameter'] = m['content'].progress_apply(lambda message: is_iambic_pentameter(message, cmu, tokenizer, spellchecker))
-
-
-def count_words_by_author(groupchat, words) -> pd.DataFrame:
-    # Given a messages df and list of words, returns a df with counts of how many times each author sent that word
+def perform_meter_analysis(groupchat, meter: str = 'iambic pentameter', check_spelling=False, progress=None) -> str:
+    """
+    Adds an "is_<meter>" column to m, e.g. "is_iambic_pentameter", and returns its name. meter is one of the keys
+    of METERS. Setting check_spelling to True corrects misspellings, but is extremely slow and not recommended.
+    """
+    if meter not in METERS:
+        raise ValueError(f'Unknown meter "{meter}", expected one of {list(METERS)}')
     m = groupchat.messages
-    m['content'] = m['content'].fillna('')
-    m['message_lower'] = m['content'].str.lower()
-
-    # Initialize the DataFrame with zeros
-    unique_authors = m['author'].unique()
-    word_counts_df = pd.DataFrame(index=unique_authors, columns=words).fillna(0)
-
-    # Using vectorized operations for counting
-    for word in words:
-        word_lower = word.lower()
-        # Create a temporary DataFrame with counts of each word for each author
-        temp_df = m[m['message_lower'].str.contains(word_lower)].groupby('author')['message_lower'].apply(
-            lambda x: x.str.count(word_lower).sum()).reset_index(name='count')
+    pattern = METERS[meter]
+    column = f"is_{meter.replace(' ', '_')}"
 
-        # Update the counts in the main DataFrame
-        for row in temp_df.itertuples(index=False):
-            word_counts_df.at[row.author, word] = row.count
+    from nltk.tokenize import WhitespaceTokenizer
+    stress_table = load_stress_table()
+    if check_spelling:
+        from spellchecker import SpellChecker
+    spellchecker = SpellChecker() if check_spelling else None
+    tokenizer = WhitespaceTokenizer()
 
-    return word_counts_df
+    # Each distinct message only needs to be checked once
+    texts = pd.unique(m['content'].dropna())
+    results = {text: isinstance(text, str) and matches_meter(my_tokenize(text, tokenizer, spellchecker), stress_table, pattern)
+               for text in track(texts, f'Checking for {meter}', progress=progress)}
+    m[column] = m['content'].map(results).fillna(False).astype(bool)
+    return column
 
-def make_repliers_dict(groupchat) -> dict:
-    # Given a messages df, returns a dictionary with each author as a key and a dictionary of repliers as the value
-    m = groupchat.messages
-    messages = m[m['meta'] == 'message']
+def perform_iambic_pentameter(groupchat, check_spelling=False) -> None:
+    """
+    Adds an "is_iambic_pentameter" column to m. Setting check_spelling to True corrects misspellings, but is extremely slow and not recommended.
+    """
+    perform_meter_analysis(groupchat, 'iambic pentameter', check_spelling)
 
-    authors = groupchat.authors
-    repliers_dict = {author: {a: 0 for a in authors} for author in authors}
 
-    for i in range(1, len(messages)):
-        current_message = messages.iloc[i]
-        previous_message = messages.iloc[i - 1]
+def term_pattern(terms: list, whole_word: bool = False) -> str:
+    # Builds a regex finding, at every position in a string, the longest of the terms starting there. The lookahead
+    # doesn't consume anything, so terms overlapping each other (e.g. "he" and "ere" in "here") are all found.
+    pattern = '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return rf'\b(?=({pattern})\b)' if whole_word else f'(?=({pattern}))'
 
-        if current_message['author'] != previous_message['author']:
-            repliers_dict[previous_message['author']][current_message['author']] += 1
+def count_words_by_author(groupchat, words, whole_word: bool = False, start=None, end=None) -> pd.DataFrame:
+    """
+    Given a messages df and list of words, returns a df with counts of how many times each author sent that word.
 
-    return repliers_dict
+    Words are matched as case-insensitive substrings by default; setting whole_word to True only counts matches on
+    word boundaries. Each word is counted as if it was searched for on its own with str.count, so words inside or
+    overlapping other requested words (e.g. "he" in "hello", or "ere" in "here") are counted for both.
 
-def make_runs_data(groupchat) -> dict:
-    # Given a messages df, returns a dictionary with each author as a key and a dictionary of runs data as the value
-    m = groupchat.messages
-    runs_data = {}
-    previous_author = None
-    current_run_length = 0
-
-    for index, row in m.iterrows():
-        author = row['author']
-        if author == previous_author:
-            current_run_length += 1
+    All words are counted in a single scan of the messages using one compiled regex, which finds the longest word
+    starting at each position. Every word starting at a position is a prefix of the longest one there, so each
+    longest match's count is added to the words it starts with. Words that can overlap themselves (e.g. "lol" in
+    "lolol") are counted separately, since str.count skips an occurrence overlapping the one before it.
+    start and end optionally limit the count to messages sent in that range.
+    """
+    m = groupchat.between(start, end).messages
+    terms = list(dict.fromkeys(word.lower() for word in words if word))
+    unique_authors = m['author'].unique()
+    word_counts_df = pd.DataFrame(0, index=unique_authors, columns=words)
+    if not terms:
+        return word_counts_df
+
+    # Find the longest term at each position of each message, then count (author, longest term) pairs
+    content = m['content'].fillna('').str.lower()
+    matches = content.str.findall(term_pattern(terms, whole_word))
+    matches = matches[matches.str.len() > 0]
+    pairs = pd.DataFrame({'author': m['author'].loc[matches.index], 'term': matches}).explode('term')
+    longest = pairs.groupby(['author', 'term'], observed=True).size().unstack(fill_value=0)
+
+    boundary = r'\b' if whole_word else ''
+    counts = pd.DataFrame(0, index=longest.index, columns=terms)
+    for term in terms:
+        # The longest matches starting with term. For whole words, a shorter term also needs a word boundary where
+        # it ends inside the longer one.
+        starting = [matched for matched in longest.columns if matched == term or re.match(re.escape(term) + boundary, matched)]
+        if any(term[:k] == term[-k:] for k in range(1, len(term))):
+            # Recounted in just the messages it was found in
+            rows = pairs.index[pairs['term'].isin(starting)].unique()
+            pattern = rf'\b{re.escape(term)}\b' if whole_word else re.escape(term)
+            counts[term] = content.loc[rows].str.count(pattern).groupby(m['author'].loc[rows], observed=True).sum()
         else:
-            if previous_author is not None:
-                if previous_author not in runs_data:
-                    runs_data[previous_author] = {'total_runs': 0, 'total_messages_in_runs': 0, 'longest_run': 0}
-                
-                runs_data[previous_author]['total_runs'] += 1
-                runs_data[previous_author]['total_messages_in_runs'] += current_run_length
-                runs_data[previous_author]['longest_run'] = max(runs_data[previous_author]['longest_run'], current_run_length)
+            counts[term] = longest[starting].sum(axis=1)
 
-            previous_author = author
-            current_run_length = 1
+    for word in words:
+        if word:
+            word_counts_df[word] = word_counts_df.index.map(counts[word.lower()]).fillna(0).astype(int)
+    return word_counts_df
 
-    # Adding the last author's run data
-    if previous_author is not None:
-        if previous_author not in runs_data:
-            runs_data[previous_author] = {'total_runs': 0, 'total_messages_in_runs': 0, 'longest_run': 0}
+def reply_times(groupchat, progress=None) -> pd.DataFrame:
+    # Every reply in the groupchat, i.e. every message sent right after a message from someone else, as a df of who
+    # was replied to (author), who replied (replier) and how many minutes the reply took. Only text messages count,
+    # like in make_reply_matrix. Messages without an author aren't replies or replied to, but still come between the
+    # messages around them. Kept until the authors, message types or timestamps change.
+    def build():
+        m = groupchat.messages
+        messages = m[m['meta'] == 'message']
+        authors = pd.Categorical(messages['author'], categories=[a for a in groupchat.authors if pd.notna(a)])
+        codes = authors.codes.astype(np.int64)
+        previous, current = codes[:-1], codes[1:]
+        is_reply = (previous != current) & (previous >= 0) & (current >= 0)
+        minutes = np.diff(messages['timestamp'].to_numpy()) / np.timedelta64(1, 'm')
+        return pd.DataFrame({'author': pd.Categorical.from_codes(previous[is_reply], authors.categories),
+                             'replier': pd.Categorical.from_codes(current[is_reply], authors.categories),
+                             'minutes': minutes[is_reply]})
+    return groupchat.cached('reply_times', ['author', 'meta', 'timestamp'], build)
+
+def timed_replies(groupchat, window: float = None) -> pd.DataFrame:
+    # reply_times without replies whose timestamps are missing, or if window is given (in minutes), that took longer
+    replies = reply_times(groupchat)
+    return replies[replies['minutes'].notna() if window is None else replies['minutes'] <= window]
+
+def grouped_percentiles(groups: np.ndarray, values: np.ndarray, n: int, percentiles: list) -> (np.ndarray, np.ndarray):
+    """
+    Returns the number of values in each of n groups (numbered 0 to n - 1 by groups), and an n x len(percentiles)
+    array of the percentiles (between 0 and 1) of each group's values, NaN for groups without any.
 
-        runs_data[previous_author]['total_runs'] += 1
-        runs_data[previous_author]['total_messages_in_runs'] += current_run_length
-        runs_data[previous_author]['longest_run'] = max(runs_data[previous_author]['longest_run'], current_run_length)
+    The values are sorted by group and value once, each group's sorted values are found with np.searchsorted, and
+    the percentiles are interpolated between them the same way as np.percentile, so no group is handled on its own.
+    """
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    bounds = np.searchsorted(groups, np.arange(n + 1))
+    counts = np.diff(bounds)
+    result = np.full((n, len(percentiles)), np.nan)
+    has_values = counts > 0
+    if has_values.any():
+        positions = bounds[:-1, None] + np.asarray(percentiles)[None, :] * (counts[:, None] - 1)
+        positions = positions[has_values]
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.ceil(positions).astype(np.int64)
+        result[has_values] = values[lower] + (values[upper] - values[lower]) * (positions - lower)
+    return counts, result
+
+def percentile_label(percentile: float) -> str:
+    # e.g. 0.5 -> '50%', like pandas' describe()
+    return f'{percentile * 100:g}%'
+
+def reply_time_stats(groupchat, percentiles: list = REPLY_TIME_PERCENTILES, window: float = None,
+                     start=None, end=None) -> pd.DataFrame:
+    # Given a groupchat, returns a df with a row for each pair of authors where one has replied to the other, indexed
+    # by who was replied to (author) and who replied (replier), with the number of replies and percentiles of how many
+    # minutes they took, e.g. the 50% column is the median. window and start/end are as in make_reply_matrix.
+    groupchat = groupchat.between(start, end)
+    replies = timed_replies(groupchat, window)
+    authors = replies['author'].cat.categories
+    n = len(authors)
+    pairs = replies['author'].cat.codes.to_numpy(np.int64) * n + replies['replier'].cat.codes.to_numpy(np.int64)
+    counts, values = grouped_percentiles(pairs, replies['minutes'].to_numpy(), n * n, percentiles)
+
+    index = pd.MultiIndex.from_product([authors, authors], names=['author', 'replier'])
+    stats = pd.DataFrame(values, index=index, columns=[percentile_label(p) for p in percentiles])
+    stats.insert(0, 'replies', counts)
+    return stats[counts > 0]
+
+def reply_time_histogram(groupchat, bins: list = REPLY_TIME_BINS, window: float = None,
+                         start=None, end=None) -> pd.DataFrame:
+    # Given a groupchat, returns a df counting each pair of authors' replies (indexed like reply_time_stats) by how many
+    # minutes they took, with a column for each bucket of reply times between the edges in bins, e.g. 1-5m.
+    groupchat = groupchat.between(start, end)
+    replies = timed_replies(groupchat, window)
+    authors = replies['author'].cat.categories
+    n, buckets = len(authors), len(bins)
+    pairs = replies['author'].cat.codes.to_numpy(np.int64) * n + replies['replier'].cat.codes.to_numpy(np.int64)
+    bucket = np.searchsorted(bins, replies['minutes'].to_numpy(), 'right') - 1
+    counts = np.bincount(pairs * buckets + bucket, minlength=n * n * buckets).reshape(n * n, buckets)
+
+    index = pd.MultiIndex.from_product([authors, authors], names=['author', 'replier'])
+    histogram = pd.DataFrame(counts, index=index, columns=reply_time_bin_labels(bins))
+    return histogram[counts.sum(axis=1) > 0]
+
+def format_minutes(minutes: float) -> str:
+    # e.g. 5 -> '5m', 90 -> '1.5h', 2880 -> '2d'
+    if minutes < 60:
+        return f'{minutes:g}m'
+    if minutes < 60 * 24:
+        return f'{minutes / 60:g}h'
+    return f'{minutes / (60 * 24):g}d'
+
+def reply_time_bin_labels(bins: list) -> list:
+    # Labels for the buckets between the edges in bins, e.g. [0, 1, 5, 60] -> ['<1m', '1-5m', '5m-1h', '1h+']
+    labels = []
+    for lower, upper in zip(bins, list(bins[1:]) + [None]):
+        if upper is None:
+            labels.append(f'{format_minutes(lower)}+')
+        elif lower == 0:
+            labels.append(f'<{format_minutes(upper)}')
+        elif format_minutes(lower)[-1] == format_minutes(upper)[-1]:
+            labels.append(f'{format_minutes(lower)[:-1]}-{format_minutes(upper)}')
+        else:
+            labels.append(f'{format_minutes(lower)}-{format_minutes(upper)}')
+    return labels
 
-    for author in runs_data:
-        runs_data[author]['average_run_length'] = runs_data[author]['total_messages_in_runs'] / runs_data[author]['total_runs']
+def draw_reply_times(fig, reply_stats, histogram):
+    # Draws a heatmap of the median minutes each author takes to reply to each other author (reply_time_stats), and
+    # the number of replies in each bucket of reply times (reply_time_histogram) onto fig, replacing anything on it
+    import seaborn as sns
+    fig.clear()
+    heatmap_ax, histogram_ax = fig.subplots(1, 2, gridspec_kw={'width_ratios': [3, 2]})
+
+    medians = reply_stats['50%'].unstack()
+    sns.heatmap(medians, cmap='YlGnBu', annot=len(medians) <= 12, fmt='.0f', ax=heatmap_ax)
+    heatmap_ax.set_title('Median Reply Time (minutes)')
+    heatmap_ax.set_xlabel('Replier')
+    heatmap_ax.set_ylabel('Replying To')
+
+    totals = histogram.sum()
+    histogram_ax.bar(range(len(totals)), totals.values)
+    histogram_ax.set_xticks(range(len(totals)))
+    histogram_ax.set_xticklabels(totals.index, rotation=45)
+    histogram_ax.set_title('Reply Times')
+    histogram_ax.set_xlabel('Time to Reply')
+    histogram_ax.set_ylabel('Number of Replies')
+    fig.tight_layout()
+
+def make_reply_matrix(groupchat, window: float = None, start=None, end=None) -> pd.DataFrame:
+    # Given a groupchat, returns an authors x authors df where each cell counts how many times the column author
+    # replied to the row author, i.e. sent the next message after them. If window is given (in minutes),
+    # only replies sent within that many minutes of the previous message are counted.
+    groupchat = groupchat.between(start, end)
+    replies = reply_times(groupchat)
+    if window is not None:
+        replies = replies[replies['minutes'] <= window]
+
+    authors = list(replies['author'].cat.categories)
+    n = len(authors)
+    pairs = replies['author'].cat.codes.to_numpy(np.int64) * n + replies['replier'].cat.codes.to_numpy(np.int64)
+    counts = np.bincount(pairs, minlength=n * n).reshape(n, n)
+    return pd.DataFrame(counts, index=pd.Index(authors, name='author'), columns=pd.Index(authors, name='replier'))
+
+def make_repliers_dict(groupchat, window: float = None, start=None, end=None) -> dict:
+    # Given a messages df, returns a dictionary with each author as a key and a dictionary of repliers as the value
+    return make_reply_matrix(groupchat, window, start, end).to_dict('index')
+
+def make_runs_data(groupchat, start=None, end=None) -> dict:
+    # Given a messages df, returns a dictionary with each author as a key and a dictionary of runs data as the value.
+    # A run is a maximal block of consecutive messages from the same author, so runs start wherever the author
+    # differs from the previous message's author, and each run's length is the distance to the next start.
+    authors = groupchat.between(start, end).messages['author']
+    if authors.empty:
+        return {}
+    starts = np.flatnonzero((authors != authors.shift()).to_numpy())
+    lengths = np.diff(np.append(starts, len(authors)))
+    runs = pd.DataFrame({'author': authors.iloc[starts].to_numpy(), 'length': lengths})
+    per_author = runs.groupby('author', sort=False, observed=True)['length'].agg(['count', 'sum', 'max'])
 
+    runs_data = {}
+    for author, row in per_author.iterrows():
+        runs_data[author] = {'total_runs': int(row['count']),
+                             'total_messages_in_runs': int(row['sum']),
+                             'longest_run': int(row['max']),
+                             'average_run_length': row['sum'] / row['count']}
     return runs_data
 
-def activity_heatmap(groupchat):
-    # Given a groupchat, plots a heatmap of activity by day of week and hour of day
-    m = groupchat.messages
+def activity_heatmap_data(groupchat, start=None, end=None) -> pd.DataFrame:
+    # Given a groupchat, returns a df counting messages by day of week (rows) and hour of day (columns)
+    cube = activity_cube(groupchat.between(start, end))
+    day_of_week = cube['hour'].dt.dayofweek.rename('day_of_week')
+    hour_of_day = cube['hour'].dt.hour.rename('hour_of_day')
+    return cube.groupby([day_of_week, hour_of_day])['count'].sum().unstack(fill_value=0)
 
-    # Convert 'timestamp' to datetime
-    m['timestamp'] = pd.to_datetime(m['timestamp'])
+def draw_activity_heatmap(fig, heatmap_data):
+    # Draws activity_heatmap_data onto fig, replacing anything already on it
+    import seaborn as sns
+    fig.clear()
+    ax = fig.add_subplot(111)
 
-    # Extract day of week and hour from 'timestamp'
-    m['day_of_week'] = m['timestamp'].dt.dayofweek
-    m['hour_of_day'] = m['timestamp'].dt.hour
+    # Plot the heatmap on the specified axes
+    sns.heatmap(heatmap_data, cmap='YlGnBu', annot=False, ax=ax)
 
-    # Prepare data for heatmap
-    # Group the data by day of week and hour of day and count the messages
-    heatmap_data = m.groupby(['day_of_week', 'hour_of_day']).size().unstack(fill_value=0)
+    ax.set_title('Activity Heatmap')
+    ax.set_xlabel('Hour of Day')
+    ax.set_ylabel('Day of Week (0: Monday - 6: Sunday)')
+    fig.tight_layout()
 
-    # Create the heatmap
-    plt.figure(figsize=(15, 8))
-    sns.heatmap(heatmap_data, cmap='YlGnBu', annot=False)
-    plt.title('Activity Heatmap of Group Chat')
-    plt.xlabel('Hour of Day')
-    plt.ylabel('Day of Week (0: Monday - 6: Sunday)')
+def activity_heatmap(groupchat, start=None, end=None):
+    # Given a groupchat, plots a heatmap of activity by day of week and hour of day
+    import matplotlib.pyplot as plt
+    draw_activity_heatmap(plt.figure(figsize=(15, 8)), activity_heatmap_data(groupchat, start, end))
     plt.show()
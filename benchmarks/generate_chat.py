@@ -0,0 +1,137 @@
+"""
+Writes a synthetic Instagram groupchat export, as message_N.html files using the markup html_parser expects
+(see HTML_CLASSES), for benchmarking. The same arguments always produce the same files.
+
+    python benchmarks/generate_chat.py benchmarks/data/100000 --messages 100000 --authors 8
+
+Like Instagram's own exports, message_1.html holds the newest messages, and each file lists its messages newest first.
+"""
+import argparse
+import html
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from html_parser import HTML_CLASSES
+
+# Relative frequency of each kind of message
+MEDIA_MIX = {'message': 0.75,
+             'image': 0.08,
+             'video': 0.03,
+             'audio': 0.02,
+             'post': 0.06,
+             'link': 0.04,
+             'deprecated_like': 0.02}
+MESSAGES_PER_FILE = 10000
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+REACTIONS = ['❤️', '😂', '😮', '😢', '😡', '👍', '👍🏽', '🔥']
+WORDS = ('the i you to a and it is that lol of in me my he she we so not this was for on what haha just like '
+         'do be have are but with no yes omg bro tonight pizza game class really know love hello there '
+         'thee shall compare summers day think going right now good time why who when').split()
+START = datetime(2019, 1, 1, 9, 0)
+
+
+def format_timestamp(t: datetime) -> str:
+    # Formats a timestamp the way Instagram's HTML export does, e.g. "Jan 05, 2023 3:04 pm"
+    hour = t.hour % 12 or 12
+    return f"{MONTHS[t.month - 1]} {t.day:02d}, {t.year} {hour}:{t.minute:02d} {'am' if t.hour < 12 else 'pm'}"
+
+def message_html(rng: random.Random, meta: str, author: str, timestamp: datetime, likers: list) -> str:
+    likes = ''
+    if likers:
+        likes = f'<ul class="{HTML_CLASSES["likers"]}">' + ''.join(f'<li>{rng.choice(REACTIONS)}{html.escape(liker)}</li>' for liker in likers) + '</ul>'
+
+    if meta == 'message':
+        text = ' '.join(rng.choices(WORDS, k=rng.randint(1, 20)))
+        body = f'<div><div></div><div>{text}</div><div></div><div>{likes}</div></div>'
+    elif meta in ('image', 'video', 'audio'):
+        tag = {'image': '<img src="photos/{}.jpg"/>', 'video': '<video src="videos/{}.mp4"></video>',
+               'audio': '<audio src="audio/{}.mp4"></audio>'}[meta].format(rng.getrandbits(32))
+        body = f'<div><div></div><div></div><div>{tag}</div><div>{likes}</div></div>'
+    elif meta == 'post':
+        body = f'<div><div><a href="https://www.instagram.com/p/{rng.getrandbits(40):x}/">instagram.com</a></div>{likes}</div>'
+    elif meta == 'link':
+        body = f'<div><div><a href="https://example.com/{rng.getrandbits(32):x}">example.com</a></div>{likes}</div>'
+    else:
+        body = f'<div><div></div><div>{html.escape(author.split()[0])} liked a message</div></div>'
+
+    return (f'<div class="{HTML_CLASSES["message"]}">'
+            f'<div class="{HTML_CLASSES["author"]}">{html.escape(author)}</div>'
+            f'<div class="{HTML_CLASSES["content"]}">{body}</div>'
+            f'<div class="{HTML_CLASSES["timestamp"]}">{format_timestamp(timestamp)}</div>'
+            '</div>')
+
+def generate_chat(path: str, messages: int = 10000, authors: int = 6, like_density: float = 0.3,
+                  media_mix: dict = MEDIA_MIX, messages_per_file: int = MESSAGES_PER_FILE, seed: int = 0,
+                  title: str = 'Benchmark Chat') -> list:
+    """
+    Writes a synthetic chat to path and returns the paths of the files written.
+
+    Parameters:
+        messages (int): Total number of messages
+        authors (int): Number of people in the chat. Some people send far more messages than others.
+        like_density (float): Fraction of messages that get liked, by one to three people
+        media_mix (dict): Relative frequency of each kind of message, see MEDIA_MIX
+        messages_per_file (int): Messages per message_N.html file
+    """
+    rng = random.Random(seed)
+    names = [f'Person {i + 1}' for i in range(authors)]
+    weights = [1 / (i + 1) for i in range(authors)]
+    metas = list(media_mix)
+    meta_weights = list(media_mix.values())
+
+    # Messages in the order they were sent. Replies usually come from someone else, and come in bursts.
+    rows = []
+    timestamp = START
+    author = rng.choices(names, weights)[0]
+    for _ in range(messages):
+        timestamp += timedelta(seconds=int(rng.expovariate(1 / 600)))
+        if rng.random() < 0.6:
+            author = rng.choices(names, weights)[0]
+        meta = rng.choices(metas, meta_weights)[0]
+        likers = rng.sample(names, rng.randint(1, min(3, authors))) if meta != 'deprecated_like' and rng.random() < like_density else []
+        rows.append(message_html(rng, meta, author, timestamp, likers))
+
+    # Newest messages first, split across files
+    rows.reverse()
+    os.makedirs(path, exist_ok=True)
+    paths = []
+    for n, start in enumerate(range(0, len(rows), messages_per_file), 1):
+        file_path = os.path.join(path, f'message_{n}.html')
+        with open(file_path, 'w', encoding='utf8') as f:
+            f.write(f'<html><head><meta charset="utf-8"><title>{html.escape(title)}</title></head><body>'
+                    f'<div class="_a70e"><div class="_4t5n" role="main">')
+            f.writelines(rows[start:start + messages_per_file])
+            f.write('</div></div></body></html>')
+        paths.append(file_path)
+    return paths
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic Instagram groupchat export for benchmarking.')
+    parser.add_argument('path', help='folder to write message_N.html files to')
+    parser.add_argument('-m', '--messages', type=int, default=10000, help='number of messages (default: 10000)')
+    parser.add_argument('-a', '--authors', type=int, default=6, help='number of people in the chat (default: 6)')
+    parser.add_argument('-l', '--like-density', type=float, default=0.3, help='fraction of messages liked (default: 0.3)')
+    parser.add_argument('--media-mix', help='comma separated meta=weight pairs, e.g. message=0.9,image=0.1 '
+                                            f'(default: {",".join(f"{k}={v}" for k, v in MEDIA_MIX.items())})')
+    parser.add_argument('--per-file', type=int, default=MESSAGES_PER_FILE, help=f'messages per file (default: {MESSAGES_PER_FILE})')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='random seed (default: 0)')
+    args = parser.parse_args(args)
+
+    media_mix = MEDIA_MIX
+    if args.media_mix:
+        media_mix = {}
+        for pair in args.media_mix.split(','):
+            meta, weight = pair.split('=')
+            if meta.strip() not in MEDIA_MIX:
+                parser.error(f'unknown message type "{meta.strip()}", expected one of {list(MEDIA_MIX)}')
+            media_mix[meta.strip()] = float(weight)
+
+    paths = generate_chat(args.path, args.messages, args.authors, args.like_density, media_mix, args.per_file, args.seed)
+    print(f'Wrote {args.messages} messages to {len(paths)} file(s) in {args.path}')
+
+
+if __name__ == '__main__':
+    main()
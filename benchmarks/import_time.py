@@ -0,0 +1,107 @@
+"""
+Measures the cold start time of the app: importing html_parser, analysis and report, and starting the GUI up to the
+point its window is shown. Each case runs in fresh interpreters, and the median time is compared against a stored
+baseline so a slower startup (or a slow dependency being imported eagerly again) is caught.
+
+    python benchmarks/import_time.py             # compare against benchmarks/import_time_baseline.json
+    python benchmarks/import_time.py --update    # record a new baseline
+
+Times depend on the machine, so record the baseline on the machine you compare on.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'import_time_baseline.json')
+# Dependencies that should only be imported once an analysis needs them
+HEAVY_MODULES = ['pandas', 'matplotlib', 'matplotlib.pyplot', 'seaborn', 'nltk', 'emoji', 'PySide6']
+CASES = {
+    'html_parser': 'import html_parser',
+    'analysis': 'import analysis',
+    'report': 'import report',
+    'gui': ('from PySide6.QtWidgets import QApplication\n'
+            'import gui\n'
+            'app = QApplication([])\n'
+            'window = gui.GroupChatAnalyzer(None)\n'
+            'window.show()\n'
+            'app.processEvents()'),
+}
+# Runs a case and prints how long it took and which heavy modules it imported
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+exec({code!r})
+print(json.dumps({{'seconds': time.perf_counter() - start, 'modules': [m for m in {modules!r} if m in sys.modules]}}))
+'''
+
+
+def run_case(code: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')  # Lets the GUI case run without a display
+    child = CHILD.format(code=code, modules=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', child], cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure(cases: list, repeat: int) -> dict:
+    results = {}
+    for case in cases:
+        runs = [run_case(CASES[case]) for _ in range(repeat)]
+        results[case] = {'seconds': round(statistics.median(run['seconds'] for run in runs), 4),
+                         'modules': runs[-1]['modules']}
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    # Returns a description of each case that got slower than the baseline allows, or imported new heavy modules
+    regressions = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        limit = baseline[case]['seconds'] * (1 + tolerance)
+        if result['seconds'] > limit:
+            regressions.append(f"{case}: {result['seconds']:.3f}s is slower than the baseline's {baseline[case]['seconds']:.3f}s")
+        new_modules = set(result['modules']) - set(baseline[case]['modules'])
+        if new_modules:
+            regressions.append(f"{case}: now imports {', '.join(sorted(new_modules))}")
+    return regressions
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark cold import and GUI startup time.')
+    parser.add_argument('cases', nargs='*', help=f'cases to run, from: {", ".join(CASES)} (default: all)')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='runs per case (default: 5)')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.25,
+                        help='allowed slowdown over the baseline, as a fraction (default: 0.25)')
+    parser.add_argument('--update', action='store_true', help='save the results as the new baseline')
+    args = parser.parse_args(args)
+    unknown = [case for case in args.cases if case not in CASES]
+    if unknown:
+        parser.error(f'unknown cases: {", ".join(unknown)}')
+
+    results = measure(args.cases or list(CASES), args.repeat)
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    for case, result in results.items():
+        base = f"  (baseline {baseline[case]['seconds']:.3f}s)" if case in baseline else ''
+        print(f"{case:12} {result['seconds']:.3f}s{base}  imports: {', '.join(result['modules']) or 'nothing heavy'}")
+
+    if args.update:
+        baseline.update(results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baseline, f, indent=4)
+        print(f'Saved baseline to {BASELINE_PATH}')
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'Regression: {regression}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Times and memory-profiles each stage of the parsing and analysis pipeline on synthetic chats of increasing size
+(see generate_chat.py), and compares the results against a stored baseline.
+
+    python benchmarks/pipeline.py                        # 10k, 100k and 1M messages
+    python benchmarks/pipeline.py --sizes 10000 100000   # skip the slow 1M run
+    python benchmarks/pipeline.py --update               # record a new baseline
+
+Each stage is timed on its own, then run again under tracemalloc for its peak memory, since tracing slows Python
+code down. tracemalloc sees Python and NumPy allocations but not lxml's, so parse_html_file's peak is an
+underestimate. Sentiment isn't included in the author stats, since it depends on nltk data and an on-disk cache.
+Times depend on the machine, so record the baseline on the machine you compare on.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import pandas as pd
+from html_parser import GroupChat, parse_html_file, separate_dfs
+from analysis import (generate_author_stats, make_runs_data, make_repliers_dict, reply_time_stats, count_words_by_author,
+                      AUTHOR_STATS_COLUMNS)
+from generate_chat import generate_chat
+
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'pipeline_baseline.json')
+DATA_PATH = os.path.join(ROOT, 'benchmarks', 'data')
+SIZES = [10000, 100000, 1000000]
+# Changes smaller than this are treated as noise rather than regressions, since the fastest stages take milliseconds
+NOISE = {'seconds': 0.01, 'peak_mb': 1}
+AUTHORS = 8
+STATS_COLUMNS = [column for column in AUTHOR_STATS_COLUMNS if column != 'Average sentiment']
+WORDS = ['lol', 'haha', 'the', 'pizza', 'he']
+
+
+def chat_path(size: int) -> str:
+    # Generates the chat for a size the first time it's needed, and reuses it after that
+    path = os.path.join(DATA_PATH, str(size))
+    params = {'messages': size, 'authors': AUTHORS}
+    params_path = os.path.join(path, 'params.json')
+    if os.path.exists(params_path):
+        with open(params_path) as f:
+            if json.load(f) == params:
+                return path
+    print(f'Generating a chat with {size} messages')
+    generate_chat(path, **params)
+    with open(params_path, 'w') as f:
+        json.dump(params, f)
+    return path
+
+def measure(fn, profile_memory: bool = True):
+    # Returns fn's result, and how long it took and the most memory it had allocated at once
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    stats = {'seconds': round(time.perf_counter() - start, 4)}
+    if profile_memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        stats['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    return result, stats
+
+def benchmark_chat(path: str, profile_memory: bool = True) -> dict:
+    # Runs each stage on the chat in path, returning the measurements of each stage
+    paths = sorted((os.path.join(path, name) for name in os.listdir(path) if name.endswith('.html')),
+                   key=lambda p: int(p.rsplit('_', 1)[-1].split('.')[0]))
+    results = {}
+
+    data, results['parse_html_file'] = measure(lambda: [parse_html_file(p) for p in paths], profile_memory)
+    all_messages = pd.concat([df for df, _ in data]).iloc[::-1]
+    del data
+    (messages, likes), results['separate_dfs'] = measure(lambda: separate_dfs(all_messages), profile_memory)
+    del all_messages
+    groupchat = GroupChat(messages, likes, 'Benchmark Chat')
+
+    def author_stats():
+        groupchat.cache.clear()  # Measures computing the stats rather than reusing them from the first run
+        return generate_author_stats(groupchat, STATS_COLUMNS)
+    _, results['generate_author_stats'] = measure(author_stats, profile_memory)
+    _, results['make_runs_data'] = measure(lambda: make_runs_data(groupchat), profile_memory)
+
+    def repliers():
+        groupchat.cache.clear()  # Includes finding the replies, which the author stats have cached
+        return make_repliers_dict(groupchat)
+    _, results['make_repliers_dict'] = measure(repliers, profile_memory)
+
+    def reply_stats():
+        groupchat.cache.clear()  # Includes finding the replies, which make_repliers_dict has cached
+        return reply_time_stats(groupchat)
+    _, results['reply_time_stats'] = measure(reply_stats, profile_memory)
+    _, results['count_words_by_author'] = measure(lambda: count_words_by_author(groupchat, WORDS), profile_memory)
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    # Returns a description of each stage that was slower or used more memory than the baseline allows
+    regressions = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if base is None:
+                continue
+            for key, unit in [('seconds', 's'), ('peak_mb', 'MB')]:
+                if key in result and key in base and result[key] > base[key] * (1 + tolerance) + NOISE[key]:
+                    regressions.append(f'{stage} at {size} messages: {result[key]}{unit}, baseline {base[key]}{unit}')
+    return regressions
+
+def print_results(results: dict, baseline: dict):
+    for size, stages in results.items():
+        print(f'\n{size} messages')
+        print(f"{'stage':24}{'seconds':>10}{'baseline':>10}{'ratio':>8}{'peak MB':>10}{'baseline':>10}")
+        for stage, result in stages.items():
+            base = baseline.get(size, {}).get(stage, {})
+            ratio = f"{result['seconds'] / base['seconds']:.2f}x" if base.get('seconds') else ''
+            print(f"{stage:24}{result['seconds']:>10.3f}{base.get('seconds', ''):>10}{ratio:>8}"
+                  f"{result.get('peak_mb', ''):>10}{base.get('peak_mb', ''):>10}")
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the parsing and analysis pipeline on synthetic chats.')
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES, help='chat sizes in messages (default: 10k, 100k and 1M)')
+    parser.add_argument('--no-memory', action='store_true', help='only time the stages, skipping the tracemalloc runs')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.25,
+                        help='allowed slowdown or memory growth over the baseline, as a fraction (default: 0.25)')
+    parser.add_argument('--update', action='store_true', help='save the results as the new baseline')
+    args = parser.parse_args(args)
+
+    results = {str(size): benchmark_chat(chat_path(size), not args.no_memory) for size in args.sizes}
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.update:
+        baseline.update(results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baseline, f, indent=4)
+        print(f'\nSaved baseline to {BASELINE_PATH}')
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'Regression: {regression}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Analysis across many groupchats with the same people, e.g.
+
+    corpus = ChatCorpus.from_folder('chats', aliases={'Bobby': 'Bob'})
+    corpus.author_stats(['Total sends', 'Longest run', 'Average sentiment'])
+
+Each chat is loaded and analyzed in its own worker process, and only the per-person results come back to be merged,
+so the chats' messages are never combined into one df.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import pandas as pd
+from html_parser import load_df
+from analysis import (generate_author_stats, count_words_by_author, activity_over_time, make_reply_matrix, reply_times,
+                      track, AUTHOR_STATS, AUTHOR_STATS_COLUMNS)
+
+# Averages are combined across chats weighted by what they average over
+AVERAGE_WEIGHTS = {'average_run_length': 'total_runs',
+                   'average_sentiment': 'scored_messages'}
+
+
+def load_shard(path: str, aliases: dict = None):
+    # Loads one chat, merging any aliases into the names they belong to
+    groupchat = load_df(path)
+    for old_name, new_name in (aliases or {}).items():
+        if old_name in groupchat.authors:
+            groupchat.rename_author(old_name, new_name)
+    return groupchat
+
+def shard_author_stats(path: str, columns: list, aliases: dict = None, start=None, end=None) -> (pd.DataFrame, pd.Series):
+    # generate_author_stats for one chat, plus the weights its averages need to be merged. If the median reply time is
+    # wanted, also returns how many replies each person took each number of minutes to send (see shard_reply_minutes),
+    # since medians can't be merged from each chat's median.
+    groupchat = load_shard(path, aliases).between(start, end)
+    needed = list(columns)
+    if 'Average run length' in columns and 'Total runs' not in columns:
+        needed.append('Total runs')
+    stats = generate_author_stats(groupchat, needed, workers=1)  # Each chat already has a process of its own
+    if 'Average sentiment' in columns:
+        m = groupchat.messages
+        stats['scored_messages'] = stats.index.map(m['content'].notna().groupby(m['author'], observed=True).sum()).fillna(0)
+    return stats, shard_reply_minutes(groupchat) if 'Median reply time' in columns else None
+
+def shard_reply_minutes(groupchat) -> pd.Series:
+    # Number of replies each person sent after each number of minutes, indexed by (replier, minutes). Timestamps are
+    # to the minute, so there are only as many rows per person as distinct reply times.
+    replies = reply_times(groupchat)
+    replies = replies[replies['minutes'].notna()]
+    return replies.groupby([replies['replier'].astype(object), 'minutes']).size()
+
+def shard_word_counts(path: str, words: list, whole_word: bool = False, aliases: dict = None, start=None, end=None) -> pd.DataFrame:
+    return count_words_by_author(load_shard(path, aliases), words, whole_word, start, end)
+
+def shard_activity(path: str, period: str = 'M', metas: list = None, aliases: dict = None, start=None, end=None) -> pd.DataFrame:
+    return activity_over_time(load_shard(path, aliases), period, metas, start, end)
+
+def shard_reply_matrix(path: str, window: float = None, aliases: dict = None, start=None, end=None) -> pd.DataFrame:
+    return make_reply_matrix(load_shard(path, aliases), window, start, end)
+
+def merge_author_stats(shards: list, reply_minutes: list = None) -> pd.DataFrame:
+    """
+    Combines author stats from several chats into one row per person, with a chats column counting how many of the
+    chats they've sent messages in. Counts are summed, longest runs take the maximum, and averages are weighted by
+    what they average over (runs for average run length, and messages with text for sentiment). Median reply times
+    are read from reply_minutes, each chat's shard_reply_minutes, see merge_reply_medians.
+    """
+    combined = pd.concat(shards)
+    grouped = combined.groupby(level='author', sort=False)
+    merged = grouped.sum()
+    if 'longest_run' in combined:
+        merged['longest_run'] = grouped['longest_run'].max()
+    for column, weight in AVERAGE_WEIGHTS.items():
+        if column in combined:
+            weighted = (combined[column] * combined[weight]).groupby(level='author', sort=False).sum()
+            merged[column] = (weighted / merged[weight]).fillna(0)
+    if 'median_reply_time' in combined:
+        merged['median_reply_time'] = merged.index.map(merge_reply_medians(reply_minutes)).fillna(0)
+    merged.insert(0, 'chats', grouped.size())
+    return merged
+
+def merge_reply_medians(shards: list) -> pd.Series:
+    """
+    Returns each person's median reply time across chats, from each chat's shard_reply_minutes, the same as taking the
+    median of all of their replies at once.
+
+    The counts are summed and sorted by person and minutes. Each person's middle replies are at known positions in the
+    running total of the counts, so they're found with np.searchsorted rather than by expanding the counts into replies.
+    """
+    counts = pd.concat(shards).groupby(level=[0, 1]).sum().sort_index()
+    if counts.empty:
+        return pd.Series(dtype=float)
+    minutes = counts.index.get_level_values(1).to_numpy(float)
+    cumulative = np.cumsum(counts.to_numpy())
+    totals = counts.groupby(level=0).sum()
+    offsets = np.cumsum(totals.to_numpy()) - totals.to_numpy()  # Replies of the people sorted before each person
+
+    middle = offsets + (totals.to_numpy() - 1) / 2
+    lower = minutes[np.searchsorted(cumulative, np.floor(middle), 'right')]
+    upper = minutes[np.searchsorted(cumulative, np.ceil(middle), 'right')]
+    return pd.Series((lower + upper) / 2, index=totals.index)
+
+def merge_counts(shards: list) -> pd.DataFrame:
+    # Sums per-chat dfs of counts, lining up their rows and columns
+    return pd.concat(shards).groupby(level=0, sort=False).sum().fillna(0).astype(int)
+
+
+class ChatCorpus:
+    """
+    A collection of groupchats, each stored in its own folder as written by html_parser.save_groupchat.
+
+    Every analysis runs on each chat in a process pool, one chat per worker, and returns one row per person across all
+    of the chats. Every analysis also takes start and end to limit it to the messages sent between them (see
+    GroupChat.between). aliases maps names to the name of the person they belong to, for people who go by different names
+    in different chats.
+    """
+    def __init__(self, paths: list, aliases: dict = None, workers: int = None) -> None:
+        self.paths = list(paths)
+        self.aliases = aliases or {}
+        self.workers = workers
+
+    @classmethod
+    def from_folder(cls, path: str, **kwargs) -> 'ChatCorpus':
+        # Makes a corpus of every parsed chat in the subfolders of path
+        paths = sorted(os.path.join(path, name) for name in os.listdir(path)
+                       if os.path.exists(os.path.join(path, name, 'title.txt')))
+        return cls(paths, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def map(self, fn, desc: str, progress=None) -> list:
+        # Runs fn(path) for each chat in a process pool, returning the results in the order of the paths
+        if not self.paths:
+            raise ValueError('The corpus has no chats')
+        executor = ProcessPoolExecutor(max_workers=self.workers or min(len(self.paths), os.cpu_count()))
+        try:
+            return list(track(executor.map(fn, self.paths), desc, len(self.paths), progress))
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def titles(self) -> list:
+        titles = []
+        for path in self.paths:
+            with open(os.path.join(path, 'title.txt')) as f:
+                titles.append(f.read())
+        return titles
+
+    def author_stats(self, columns: list = AUTHOR_STATS_COLUMNS, progress=None, start=None, end=None) -> pd.DataFrame:
+        # generate_author_stats across every chat, see merge_author_stats
+        shards = self.map(partial(shard_author_stats, columns=columns, aliases=self.aliases, start=start, end=end),
+                          'Computing author stats', progress)
+        merged = merge_author_stats([stats for stats, _ in shards], [minutes for _, minutes in shards])
+        names = [name for column, (name, *_) in AUTHOR_STATS.items() if column in columns]
+        return merged[['chats'] + names]
+
+    def word_counts(self, words: list, whole_word: bool = False, progress=None, start=None, end=None) -> pd.DataFrame:
+        # count_words_by_author across every chat
+        shards = self.map(partial(shard_word_counts, words=words, whole_word=whole_word, aliases=self.aliases, start=start, end=end),
+                          'Counting words', progress)
+        return merge_counts(shards)
+
+    def activity_over_time(self, period: str = 'M', metas: list = None, progress=None, start=None, end=None) -> pd.DataFrame:
+        # activity_over_time across every chat
+        shards = self.map(partial(shard_activity, period=period, metas=metas, aliases=self.aliases, start=start, end=end),
+                          'Computing activity over time', progress)
+        return merge_counts(shards).sort_index()
+
+    def reply_matrix(self, window: float = None, progress=None, start=None, end=None) -> pd.DataFrame:
+        # make_reply_matrix across every chat
+        shards = self.map(partial(shard_reply_matrix, window=window, aliases=self.aliases, start=start, end=end),
+                          'Counting replies', progress)
+        return merge_counts(shards)
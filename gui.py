@@ -1,16 +1,20 @@
+# pandas, matplotlib and the analysis modules take a while to import, so they're imported when they're first needed
+# (mostly on background threads) rather than before the window can be shown
 import sys
-import pandas as pd
 from PySide6.QtWidgets import (QApplication, QMainWindow, QTableView, QPushButton, QVBoxLayout, QWidget, 
                                QLineEdit, QLabel, QTabWidget, QHBoxLayout, QComboBox, QFileDialog,
-                               QCheckBox, QPushButton, QDialog, QDialogButtonBox, QListWidget)
-from PySide6.QtCore import Qt, QAbstractTableModel
+                               QCheckBox, QPushButton, QDialog, QDialogButtonBox, QListWidget, QProgressBar, QDateEdit)
+from PySide6.QtCore import Qt, QDate, QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool, Signal
 from PySide6.QtGui import QFont
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-from html_parser import load_df
-from analysis import (activity_over_time, format_x_labels_universal, detect_time_period, generate_author_stats, count_words_by_author)
-import seaborn as sns
 import unicodedata
+from datetime import datetime, time
+from collections import OrderedDict
+import traceback
+
+# Columns of the messages table that the GUI uses; anything else stored alongside them is not loaded
+MESSAGE_COLUMNS = ['meta', 'author', 'timestamp', 'content', 'post_id']
+# Number of rows sampled when sizing table columns to their contents
+COLUMN_SIZE_SAMPLE = 200
 
 def clean_string(s):
     # unused for now
@@ -29,6 +33,13 @@ class GroupChatAnalyzer(QMainWindow):
         self.setWindowTitle("Instagram Group Chat Analyzer")
         self.setGeometry(100, 100, 1000, 700)
 
+        # Background jobs, see runJob
+        self.threadPool = QThreadPool.globalInstance()
+        self.currentJob = None
+        self.jobCallback = None
+        # Set by setGroupchat once a groupchat has loaded, see requireGroupchat
+        self.groupchat = None
+
         self.initUI()
         if directory:
             self.directory = directory
@@ -54,6 +65,78 @@ class GroupChatAnalyzer(QMainWindow):
         self.initTab3()
         self.tabs.addTab(self.tab3, "Graphs")
 
+        # Progress of background jobs, shown in the status bar while a job is running
+        self.progressLabel = QLabel()
+        self.progressBar = QProgressBar()
+        self.cancelButton = QPushButton("Cancel")
+        self.cancelButton.clicked.connect(self.cancelJob)
+        for widget in [self.progressLabel, self.progressBar, self.cancelButton]:
+            self.statusBar().addPermanentWidget(widget)
+            widget.hide()
+
+    def runJob(self, fn, onFinished, description):
+        # Runs fn(progress) on a background thread, then passes its result to onFinished on the main thread.
+        # Only one job runs at a time.
+        if self.isBusy():
+            return
+        worker = Worker(fn)
+        worker.signals.progress.connect(self.onJobProgress)
+        worker.signals.finished.connect(self.onJobFinished)
+        worker.signals.error.connect(self.onJobError)
+        worker.signals.cancelled.connect(self.onJobCancelled)
+        self.currentJob = worker
+        self.jobCallback = onFinished
+
+        self.progressLabel.setText(description)
+        self.progressBar.setRange(0, 0)  # Shows a busy indicator until the job reports its progress
+        for widget in [self.progressLabel, self.progressBar, self.cancelButton]:
+            widget.show()
+        self.threadPool.start(worker)
+
+    def requireGroupchat(self):
+        # Returns whether a groupchat has loaded, telling the user to wait or load one if not
+        if self.groupchat is None:
+            message = "Please wait for the messages to load" if self.currentJob is not None else "Please load messages first"
+            self.statusBar().showMessage(message, 3000)
+            return False
+        return True
+
+    def isBusy(self):
+        # Returns whether a job is running, telling the user to wait if so
+        if self.currentJob is not None:
+            self.statusBar().showMessage("Please wait for the current task to finish, or cancel it", 3000)
+            return True
+        return False
+
+    def cancelJob(self):
+        if self.currentJob is not None:
+            self.currentJob.cancel()
+            self.progressLabel.setText("Cancelling...")
+
+    def endJob(self):
+        self.currentJob = None
+        self.jobCallback = None
+        for widget in [self.progressLabel, self.progressBar, self.cancelButton]:
+            widget.hide()
+
+    def onJobProgress(self, done, total, description):
+        self.progressLabel.setText(description)
+        self.progressBar.setRange(0, total)
+        self.progressBar.setValue(done)
+
+    def onJobFinished(self, result):
+        callback = self.jobCallback
+        self.endJob()
+        callback(result)
+
+    def onJobError(self, message):
+        self.endJob()
+        self.statusBar().showMessage(f"Error: {message}", 10000)
+
+    def onJobCancelled(self):
+        self.endJob()
+        self.statusBar().showMessage("Cancelled", 3000)
+
     def initTab1(self):
         layout = QVBoxLayout(self.tab1)
 
@@ -68,10 +151,21 @@ class GroupChatAnalyzer(QMainWindow):
         layout.addWidget(renameButton)
 
         # Search bar
-        searchBar = QLineEdit()
-        searchBar.setPlaceholderText("Search messages...")
-        searchBar.textChanged.connect(self.searchMessages)
-        layout.addWidget(searchBar)
+        self.searchBar = QLineEdit()
+        self.searchBar.setPlaceholderText("Search messages...")
+        self.searchBar.textChanged.connect(self.searchMessages)
+        layout.addWidget(self.searchBar)
+
+        # Search filters, by author and date
+        filterLayout = QHBoxLayout()
+        self.searchAuthorComboBox = QComboBox()
+        self.searchAuthorComboBox.addItem("All authors")
+        self.searchAuthorComboBox.currentIndexChanged.connect(lambda: self.searchMessages(self.searchBar.text()))
+        filterLayout.addWidget(self.searchAuthorComboBox)
+        self.searchRange = DateRangeSelector()
+        self.searchRange.rangeChanged.connect(lambda: self.searchMessages(self.searchBar.text()))
+        filterLayout.addWidget(self.searchRange, 1)
+        layout.addLayout(filterLayout)
 
         # Messages table
         self.tableView = QTableView()
@@ -83,6 +177,8 @@ class GroupChatAnalyzer(QMainWindow):
 
     def openRenameDialog(self):
         # Lets you rename authors multiple times
+        if self.isBusy() or not self.requireGroupchat():
+            return
         dialog = RenameDialog(self)
 
         # Create a "Finished" button
@@ -96,8 +192,9 @@ class GroupChatAnalyzer(QMainWindow):
             if old_name and new_name and new_name != old_name:
                 self.groupchat.rename_author(old_name, new_name)
                 self.extractVariablesFromGroupchat()
-                self.tableView.setModel(PandasModel(self.messages))
-                self.tableView.resizeColumnsToContents()
+                self.setTableModel(self.tableView, PandasModel(self.messages))
+                self.updateSearchAuthors()
+                self.searchMessages(self.searchBar.text())
                 self.updateStatistics()
                 print(self.groupchat.authors)
                 print(self.authors)
@@ -121,6 +218,10 @@ class GroupChatAnalyzer(QMainWindow):
         wordCountButton.clicked.connect(self.openWordCountDialog)
         layout.addWidget(wordCountButton)
 
+        # Optional date range for the analyses
+        self.analysisRange = DateRangeSelector()
+        layout.addWidget(self.analysisRange)
+
         # Results display area (as a table)
         self.resultsTable = QTableView()
         layout.addWidget(self.resultsTable)
@@ -132,8 +233,13 @@ class GroupChatAnalyzer(QMainWindow):
 
     def displayAnalysis(self, results_df):
         # Display results in the table
-        self.resultsTable.setModel(PandasModel(results_df))
-        self.resultsTable.resizeColumnsToContents()
+        self.setTableModel(self.resultsTable, PandasModel(results_df))
+
+    def setTableModel(self, view, model):
+        # Sets a table's model and sizes its columns from a sample of rows, rather than measuring every row
+        view.setModel(model)
+        view.horizontalHeader().setResizeContentsPrecision(COLUMN_SIZE_SAMPLE)
+        view.resizeColumnsToContents()
 
     def exportResults(self):
         # Export results to csv
@@ -161,16 +267,27 @@ class GroupChatAnalyzer(QMainWindow):
         heatmapButton.clicked.connect(lambda: self.updateGraph("Activity Heatmap"))
         button_layout.addWidget(heatmapButton)
 
+        replyTimesButton = QPushButton("Reply Times")
+        replyTimesButton.clicked.connect(lambda: self.updateGraph("Reply Times"))
+        button_layout.addWidget(replyTimesButton)
+
+        # Optional date range for the graphs
+        self.graphRange = DateRangeSelector()
+        button_layout.addWidget(self.graphRange)
+
         button_layout.addStretch(1)
 
         button_widget = QWidget()
         button_widget.setLayout(button_layout)
         layout.addWidget(button_widget)
 
-        # Graph display area
-        self.figure = Figure()
-        self.canvas = FigureCanvas(self.figure)
-        layout.addWidget(self.canvas)
+        # Graph display area. The canvas is added by initCanvas when the first graph is drawn.
+        self.figure = None
+        self.canvas = None
+        self.graphLayout = QVBoxLayout()
+        graphArea = QWidget()
+        graphArea.setLayout(self.graphLayout)
+        layout.addWidget(graphArea, 1)
 
         # Export button
         exportButton = QPushButton("Export")
@@ -183,12 +300,31 @@ class GroupChatAnalyzer(QMainWindow):
             selected_directory = QFileDialog.getExistingDirectory()
         else:
             selected_directory = directory
-        self.groupchat = load_df(selected_directory)
+        if not selected_directory:
+            return
+
+        def load(progress):
+            from html_parser import load_df
+            from analysis import activity_cube
+            groupchat = load_df(selected_directory, columns={'messages': MESSAGE_COLUMNS})
+            groupchat.messages['content'] = groupchat.messages['content'].fillna("")
+            groupchat.search_index  # Build the search index and activity cube up front so searching and graphs stay fast
+            activity_cube(groupchat)
+            return groupchat
+        self.runJob(load, self.setGroupchat, "Loading messages")
+
+    def setGroupchat(self, groupchat):
+        self.groupchat = groupchat
         self.extractVariablesFromGroupchat()
-        self.messages['content'].fillna("", inplace=True)
-        self.tableView.setModel(PandasModel(self.groupchat.messages))
-        self.tableView.resizeColumnsToContents()
+        self.setTableModel(self.tableView, PandasModel(self.groupchat.messages))
         self.updateStatistics()
+        self.updateSearchAuthors()
+        if len(self.messages):
+            first, last = self.messages['timestamp'].iloc[[0, -1]]
+            for selector in [self.analysisRange, self.graphRange, self.searchRange]:
+                selector.setDates(first.date(), last.date())
+        if self.searchBar.text():
+            self.searchMessages(self.searchBar.text())  # Anything typed while the messages were loading
         
     def extractVariablesFromGroupchat(self):
         # Extract variables from the groupchat
@@ -197,130 +333,111 @@ class GroupChatAnalyzer(QMainWindow):
         self.authors = self.groupchat.authors
         self.title = self.groupchat.title
 
+    def updateSearchAuthors(self):
+        # Fills the search's author filter with the groupchat's authors, keeping the selected author if they're still there
+        selected = self.searchAuthorComboBox.currentText()
+        self.searchAuthorComboBox.blockSignals(True)
+        self.searchAuthorComboBox.clear()
+        self.searchAuthorComboBox.addItem("All authors")
+        self.searchAuthorComboBox.addItems(sorted(str(author) for author in self.authors if isinstance(author, str)))
+        self.searchAuthorComboBox.setCurrentIndex(max(self.searchAuthorComboBox.findText(selected), 0))
+        self.searchAuthorComboBox.blockSignals(False)
+
     def searchMessages(self, text):
-        if text:
-            filtered_df = self.messages[self.messages['content'].str.contains(text, case=False)]
-            self.tableView.setModel(PandasModel(filtered_df))
+        if self.groupchat is None:
+            return  # Searched once the messages have loaded, see setGroupchat
+        authors = [self.searchAuthorComboBox.currentText()] if self.searchAuthorComboBox.currentIndex() > 0 else None
+        start, end = self.searchRange.getRange()
+        if text or authors or start is not None:
+            rows = self.groupchat.search_index.search(text, authors=authors, start=start, end=end)
+            self.tableView.setModel(PandasModel(self.messages, rows=rows))
         else:
             self.tableView.setModel(PandasModel(self.messages))
 
     def updateStatistics(self):
-        message_counts = self.messages['author'].value_counts()
+        from analysis import messages_per_author
+        message_counts = messages_per_author(self.groupchat)
         self.statsLabel.setText(f"Total Messages: {len(self.messages)}\nMessages per User:\n{message_counts}")
 
     def updateGraph(self, graphType):
+        # The graph's data is computed in the background, and drawn once it's ready
+        if not self.requireGroupchat():
+            return
+        from analysis import (messages_per_author, activity_over_time, activity_heatmap_data, reply_time_stats,
+                              reply_time_histogram, draw_messages_per_user, draw_activity_over_time, draw_activity_heatmap,
+                              draw_reply_times)
+        start, end = self.graphRange.getRange()
         if graphType == "Messages per User":
-            self.figure.clear()
-            ax = self.figure.add_subplot(111)
-            message_counts = self.messages['author'].value_counts()
-            ax.bar(message_counts.index, message_counts.values)
-            ax.set_xlabel('User')
-            ax.set_ylabel('Number of Messages')
-            ax.set_title('Messages per User')
-            ax.figure.tight_layout()
-            self.canvas.draw()
+            self.runJob(lambda progress: messages_per_author(self.groupchat, start, end),
+                        lambda data: self.drawGraph(draw_messages_per_user, data), "Counting messages")
         elif graphType == "Activity Over Time":
-            self.plot_activity_over_time(self.figure, self.groupchat)
-            self.canvas.draw()
+            self.runJob(lambda progress: activity_over_time(self.groupchat, start=start, end=end),
+                        lambda data: self.drawGraph(draw_activity_over_time, data), "Computing activity over time")
         elif graphType == "Activity Heatmap":
-            self.plot_activity_heatmap(self.figure, self.groupchat)
-            self.canvas.draw()
+            self.runJob(lambda progress: activity_heatmap_data(self.groupchat, start, end),
+                        lambda data: self.drawGraph(draw_activity_heatmap, data), "Computing activity heatmap")
+        elif graphType == "Reply Times":
+            self.runJob(lambda progress: (reply_time_stats(self.groupchat, start=start, end=end),
+                                          reply_time_histogram(self.groupchat, start=start, end=end)),
+                        lambda data: self.drawGraph(draw_reply_times, data[0], histogram=data[1]), "Computing reply times")
+
+    def initCanvas(self):
+        # Creates the graph canvas, which isn't done up front since matplotlib is slow to import
+        if self.canvas is None:
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+            from matplotlib.figure import Figure
+            self.figure = Figure()
+            self.canvas = FigureCanvas(self.figure)
+            self.graphLayout.addWidget(self.canvas)
+
+    def drawGraph(self, plot, data, **kwargs):
+        self.initCanvas()
+        plot(self.figure, data, **kwargs)
+        self.canvas.draw()
 
     def exportGraph(self):
+        if self.figure is None:
+            self.statusBar().showMessage("There is no graph to export yet", 3000)
+            return
         selected_file, _ = QFileDialog.getSaveFileName(self, "Save Graph", "", "PNG Files (*.png)")
         if selected_file:
             self.figure.savefig(selected_file)
 
-    def plot_activity_over_time(self, fig, groupchat, period='M', authors='all', label_frequency=4):
-        # Clear the existing figure and create a new axes
-        fig.clear()
-        ax = fig.add_subplot(111)
-
-        activity_data = activity_over_time(groupchat, period)
-
-        if authors == 'all':
-            data_to_plot = activity_data.sum(axis=1)
-        elif authors is not None:
-            data_to_plot = activity_data[authors]
-        else:
-            data_to_plot = activity_data
-
-        period = detect_time_period(data_to_plot.index)
-        labels = format_x_labels_universal(index=data_to_plot.index, period=period)
-
-        # Reducing the frequency of labels to avoid crowding
-        for i in range(len(labels)):
-            if i % label_frequency != 0 and period != 'Y':
-                labels[i] = ''
-
-        # Plotting using the ax object
-        data_to_plot.plot(kind='bar', ax=ax, figsize=(15, 7))
-
-        ax.set_title('Activity Over Time')
-        ax.set_xlabel('Time Period')
-        ax.set_ylabel('Number of Messages')
-
-        # Set the custom labels with reduced frequency
-        ax.set_xticks(range(len(labels)))
-        ax.set_xticklabels(labels, rotation=45)
-
-        if authors != 'all':
-            ax.legend(title='Authors')
-
-        fig.tight_layout()
-        fig.subplots_adjust(left=0.15, right=0.9, top=0.9, bottom=0.1)
-        
-    def plot_activity_heatmap(self, fig, groupchat):
-        # Clear the existing figure and create a new axes
-        fig.clear()
-        ax = fig.add_subplot(111)
-
-        m = groupchat.messages
-
-        # Convert 'timestamp' to datetime
-        m['timestamp'] = pd.to_datetime(m['timestamp'])
-
-        # Extract day of week and hour from 'timestamp'
-        m['day_of_week'] = m['timestamp'].dt.dayofweek
-        m['hour_of_day'] = m['timestamp'].dt.hour
-
-        # Prepare data for heatmap
-        # Group the data by day of week and hour of day and count the messages
-        heatmap_data = m.groupby(['day_of_week', 'hour_of_day']).size().unstack(fill_value=0)
-
-        # Plot the heatmap on the specified axes
-        sns.heatmap(heatmap_data, cmap='YlGnBu', annot=False, ax=ax)
-
-        ax.set_title('Activity Heatmap')
-        ax.set_xlabel('Hour of Day')
-        ax.set_ylabel('Day of Week (0: Monday - 6: Sunday)')
-        fig.tight_layout()
-
     def openWordCountDialog(self):
+        if not self.requireGroupchat():
+            return
         dialog = WordCountDialog(self)
         if dialog.exec():
             words = dialog.getWords()
-            self.performWordCountAnalysis(words)
+            self.performWordCountAnalysis(words, whole_word=dialog.getWholeWord())
 
-    def performWordCountAnalysis(self, words):
+    def performWordCountAnalysis(self, words, whole_word=False):
         # Split words and perform analysis
         word_list = [word.strip() for word in words.split(',')]
         # Now perform your analysis with word_list
-        results_df = count_words_by_author(self.groupchat, word_list).reset_index()
-        self.displayAnalysis(results_df)
+        from analysis import count_words_by_author
+        start, end = self.analysisRange.getRange()
+        self.runJob(lambda progress: count_words_by_author(self.groupchat, word_list, whole_word, start, end).reset_index(),
+                    self.displayAnalysis, "Counting words")
 
     def openAuthorStatsDialog(self):
-        columns = ['Total sends', 'Likes given', 'Likes received', 'Word count', 'Average sentiment', 'Total runs', 'Longest run', 'Average run length', 'Total messages', 'Total links', 'Total images', 'Total posts', 'Total videos', 'Total audios']
-        dialog = AuthorStatsDialog(self, columns=columns)
+        if not self.requireGroupchat():
+            return
+        from analysis import AUTHOR_STATS_COLUMNS
+        dialog = AuthorStatsDialog(self, columns=AUTHOR_STATS_COLUMNS)
         if dialog.exec():
             selected_columns = dialog.getColumns()
             self.performAuthorStatsAnalysis(selected_columns)
 
     def performAuthorStatsAnalysis(self, columns):
-        results_df = generate_author_stats(self.groupchat, columns).reset_index()
-        self.displayAnalysis(results_df)
+        from analysis import generate_author_stats
+        start, end = self.analysisRange.getRange()
+        self.runJob(lambda progress: generate_author_stats(self.groupchat, columns, progress=progress, start=start, end=end).reset_index(),
+                    self.displayAnalysis, "Computing author stats")
 
     def openActivityOverTimeDialog(self):
+        if not self.requireGroupchat():
+            return
         dialog = ActivityOverTimeDialog(self)
         if dialog.exec():
             period = dialog.getPeriod()
@@ -328,34 +445,167 @@ class GroupChatAnalyzer(QMainWindow):
             self.performActivityOverTimeAnalysis(period, authors)
 
     def performActivityOverTimeAnalysis(self, period, authors):
-        self.plot_activity_over_time(self.figure, self.groupchat, period=period, authors=authors)
-        self.canvas.draw()
-        
+        from analysis import activity_over_time, draw_activity_over_time
+        start, end = self.graphRange.getRange()
+        self.runJob(lambda progress: activity_over_time(self.groupchat, period, start=start, end=end),
+                    lambda data: self.drawGraph(draw_activity_over_time, data, authors=authors), "Computing activity over time")
+
+
+class WorkerSignals(QObject):
+    progress = Signal(int, int, str)
+    finished = Signal(object)
+    error = Signal(str)
+    cancelled = Signal()
+
+class Worker(QRunnable):
+    # Runs fn(progress) on a thread pool thread, reporting back through signals. progress is a callback for
+    # analysis.track, which raises AnalysisCancelled once the worker has been cancelled so the job stops early.
+    def __init__(self, fn):
+        super().__init__()
+        self.setAutoDelete(False)  # The window keeps the worker alive until its signals have been handled
+        self.fn = fn
+        self.signals = WorkerSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def reportProgress(self, done, total, description):
+        if self.cancelled:
+            from analysis import AnalysisCancelled
+            raise AnalysisCancelled()
+        self.signals.progress.emit(done, total, description)
+
+    def run(self):
+        from analysis import AnalysisCancelled
+        try:
+            result = self.fn(self.reportProgress)
+        except AnalysisCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
+        else:
+            if self.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
 
-class PandasModel(QAbstractTableModel):
-    def __init__(self, df):
-        QAbstractTableModel.__init__(self)
-        self._data = df
 
-    def rowCount(self, parent=None):
-        return self._data.shape[0]
+class PandasModel(QAbstractTableModel):
+    # Table model for a df. Each column is pulled out into a NumPy array once, rows are handed to the view in
+    # batches as it scrolls (see canFetchMore/fetchMore), and formatted cell strings are kept in an LRU cache.
+    # rows optionally restricts the model to those row positions of df, without copying the df.
+    BATCH_SIZE = 1000
+    CACHE_SIZE = 20000
 
-    def columnCount(self, parent=None):
-        return self._data.shape[1]
+    def __init__(self, df, rows=None):
+        QAbstractTableModel.__init__(self)
+        self._df = df
+        self._rows = rows
+        self._size = len(df) if rows is None else len(rows)
+        self._loaded = min(self._size, self.BATCH_SIZE)
+        self._columns = [self.extractColumn(df.iloc[:, i]) for i in range(df.shape[1])]
+        self._cache = OrderedDict()
+
+    @property
+    def _data(self):
+        # The df shown by the model
+        return self._df if self._rows is None else self._df.iloc[self._rows]
+
+    @staticmethod
+    def extractColumn(column):
+        # Returns the column's values as an array, and a function that formats one of them for display
+        import pandas as pd
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            categories = column.cat.categories.to_numpy()
+            return column.cat.codes.to_numpy(), lambda code: str(categories[code]) if code >= 0 else 'nan'
+        if column.dtype.kind == 'M':
+            return column.to_numpy(), lambda value: str(pd.Timestamp(value))
+        return column.to_numpy(), lambda value: format(value, '.3f') if isinstance(value, float) else str(value)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < self._size
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(self.BATCH_SIZE, self._size - self._loaded)
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
 
     def data(self, index, role=Qt.DisplayRole):
         if index.isValid() and role == Qt.DisplayRole:
-            value = self._data.iloc[index.row(), index.column()]
-            if isinstance(value, float):
-                return format(value, '.3f')
-            return str(value)
+            key = (index.row(), index.column())
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            row = index.row() if self._rows is None else self._rows[index.row()]
+            values, formatter = self._columns[index.column()]
+            text = formatter(values[row])
+            self._cache[key] = text
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return text
         return None
 
     def headerData(self, section, orientation, role):
         if role == Qt.DisplayRole and orientation == Qt.Horizontal:
-            return self._data.columns[section]
+            return self._df.columns[section]
         return None
 
+class DateRangeSelector(QWidget):
+    # Checkbox and pair of dates for limiting an analysis, graph or search to the messages sent between them
+    rangeChanged = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.limitCheckBox = QCheckBox("Only include messages from")
+        layout.addWidget(self.limitCheckBox)
+
+        dates_layout = QHBoxLayout()
+        self.startEdit = QDateEdit()
+        self.endEdit = QDateEdit()
+        for label, edit in [(None, self.startEdit), ("to", self.endEdit)]:
+            if label:
+                dates_layout.addWidget(QLabel(label))
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("MMM d, yyyy")
+            edit.setEnabled(False)
+            self.limitCheckBox.toggled.connect(edit.setEnabled)
+            edit.dateChanged.connect(self.onDateChanged)
+            dates_layout.addWidget(edit)
+        dates_layout.addStretch(1)
+        layout.addLayout(dates_layout)
+        self.limitCheckBox.toggled.connect(self.rangeChanged)
+
+    def onDateChanged(self):
+        if self.limitCheckBox.isChecked():
+            self.rangeChanged.emit()
+
+    def setDates(self, first, last):
+        # Sets the range of dates that can be picked to the groupchat's first and last days, and selects all of them
+        first, last = QDate(first.year, first.month, first.day), QDate(last.year, last.month, last.day)
+        for edit in [self.startEdit, self.endEdit]:
+            edit.setDateRange(first, last)
+        self.startEdit.setDate(first)
+        self.endEdit.setDate(last)
+
+    def getRange(self):
+        # Returns the selected start and end, including all of the end day, or (None, None) for all messages
+        if not self.limitCheckBox.isChecked():
+            return None, None
+        return (datetime.combine(self.startEdit.date().toPython(), time.min),
+                datetime.combine(self.endEdit.date().toPython(), time.max))
+
 class WordCountDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -368,6 +618,10 @@ class WordCountDialog(QDialog):
         self.wordInput = QLineEdit()
         layout.addWidget(self.wordInput)
 
+        # Whether to only count whole words, rather than any occurrence inside other words
+        self.wholeWordCheckBox = QCheckBox("Match whole words only")
+        layout.addWidget(self.wholeWordCheckBox)
+
         # Dialog buttons
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         buttons.accepted.connect(self.accept)
@@ -377,6 +631,9 @@ class WordCountDialog(QDialog):
     def getWords(self):
         return self.wordInput.text()
 
+    def getWholeWord(self):
+        return self.wholeWordCheckBox.isChecked()
+
 class AuthorStatsDialog(QDialog):
     def __init__(self, parent=None, columns=None):
         super().__init__(parent)
@@ -1,11 +1,18 @@
-from bs4 import BeautifulSoup
+from lxml import etree
 from tqdm import tqdm
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import re
 import glob
-import emoji
-from os import makedirs
+import hashlib
+import json
+from os import makedirs, listdir, remove, path as os_path
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, lru_cache
+from collections import defaultdict, OrderedDict
+from copy import copy
+from search_index import MessageIndex
 
 HTML_CLASSES = {'author': '_3-95 _2pim _a6-h _a6-i',
                 'timestamp': '_3-94 _a6-o',
@@ -13,23 +20,161 @@ HTML_CLASSES = {'author': '_3-95 _2pim _a6-h _a6-i',
                 'message': "pam _3-95 _2ph- _a6-g uiBoxWhite noborder",
                 'likers': '_a6-q'}
 DEPRECATED_LIKE_PATTERN = re.compile('^\S+ liked a message')
+TIMESTAMP_FORMATS = ['%b %d, %Y %I:%M %p', '%b %d, %Y, %I:%M %p']
+CONTENT_TEXT_XPATH = etree.XPath('.//text()')
+META_TYPES = ['message', 'link', 'image', 'post', 'video', 'audio', 'deprecated_like']
+COLUMN_DTYPES = {'timestamp': 'datetime64[ns]',
+                 'meta': pd.CategoricalDtype(META_TYPES),
+                 'author': 'category',
+                 'liker': 'category',
+                 'post_id': 'int32'}
+STORAGE_FORMATS = ['parquet', 'csv']
+# Version of parse_html_file's output, stored in parse_html_folder's manifest. Bump it whenever the parsed dfs change,
+# so files cached by an older parser are parsed again.
+PARSER_VERSION = 2
 
+@lru_cache(maxsize=None)
+def leading_emoji_pattern() -> re.Pattern:
+    # Matches an emoji at the start of a string, trying longer emojis (e.g. with skin tones) first.
+    # emoji is only imported here since its data takes a while to load and is only needed when parsing likes.
+    import emoji
+    emojis = sorted(emoji.EMOJI_DATA, key=len, reverse=True)
+    return re.compile('(?:' + '|'.join(map(re.escape, emojis)) + ')')
+
+@lru_cache(maxsize=None)
 def remove_first_emoji(s):
-    # Find all emojis in the string
-    all_emojis = emoji.emoji_list(s)
+    # Likers are shown as their reaction emoji followed by their name, and there are only a handful of
+    # distinct reaction/name combinations in a chat, so each one is only checked once
     # If the string starts with an emoji, remove it
-    if all_emojis and all_emojis[0]['match_start'] == 0:
+    match = leading_emoji_pattern().match(s)
+    if match:
         # Remove the first emoji by slicing the string from the end of the emoji
-        return s[all_emojis[0]['match_end']:]
+        return s[match.end():]
     return s
 
+def apply_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    # Converts whichever of the known columns are present to their storage types
+    for column, dtype in COLUMN_DTYPES.items():
+        if column not in df or df[column].dtype == dtype:
+            continue
+        if column == 'timestamp':
+            df[column] = pd.to_datetime(df[column])
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+def rename_category(s: pd.Series, old, new) -> pd.Series:
+    # Renames a category of a categorical series. Only the categories change, the codes stay as they are.
+    if old not in s.cat.categories:
+        return s
+    if new in s.cat.categories:
+        # Merging two categories means moving old's codes over to new
+        return s.where(s != old, new).cat.remove_categories([old])
+    return s.cat.rename_categories({old: new})
+
 class GroupChat:
+    """
+    A groupchat's messages and likes.
+
+    author and liker are categoricals sharing a single dictionary of names, so both columns are stored as small
+    integer codes and renaming someone only changes their entry in the dictionary. meta is a categorical of META_TYPES.
+
+    Messages are kept in order of their timestamps, numbered by post_id in that order, and likes are kept in order of
+    post_id, so the messages and likes in a time range are contiguous slices found by binary search (see between).
+    """
+    # Number of date range views kept by between(), dropping the least recently used
+    VIEW_CACHE_SIZE = 4
+
     def __init__(self, messages, likes, title) -> None:
-        self.messages = messages
-        self.likes = likes
+        self.messages, self.likes = sort_by_timestamp(apply_dtypes(messages), apply_dtypes(likes))
         self.title = title
-        self.authors = self.messages['author'].unique()
+        # The sorted timestamps, searched by between()
+        self.timestamps = self.messages['timestamp'].to_numpy() if 'timestamp' in self.messages else None
+
+        names = self.messages['author'].cat.categories.union(self.likes['liker'].cat.categories)
+        self.messages['author'] = self.messages['author'].cat.set_categories(names)
+        self.likes['liker'] = self.likes['liker'].cat.set_categories(names)
+
+        self.authors = np.asarray(self.messages['author'].unique())
+        self._search_index = None
+        # Results derived from the messages and likes (e.g. analysis.activity_cube), see cached
+        self.cache = {}
+        # Version of each column of the messages and likes, bumped by changed() whenever the column is modified
+        self.versions = defaultdict(int)
+        # Recent views returned by between(), with the versions of the columns they were made from
+        self.views = OrderedDict()
+
+    @property
+    def search_index(self) -> MessageIndex:
+        # Inverted index over the messages' content, built the first time it's needed
+        if self._search_index is None:
+            self._search_index = MessageIndex(self.messages)
+        return self._search_index
     
+    def between(self, start=None, end=None) -> 'GroupChat':
+        """
+        Returns a GroupChat of the messages sent from start to end (inclusive), and their likes. Either bound can be
+        None to leave that side of the range open.
+
+        The range is found by binary search on the sorted timestamps, and the returned messages and likes are slices
+        of this groupchat's dfs rather than copies, so they shouldn't be modified. The last few views (see
+        VIEW_CACHE_SIZE) are kept until this groupchat changes, so repeated analyses of the same range reuse the view's
+        own cached results without every range ever picked staying in memory.
+        """
+        if start is None and end is None:
+            return self
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        key = (start, end)
+        versions = tuple(self.versions[column] for column in list(COLUMN_DTYPES) + ['content'])
+        if key in self.views and self.views[key][0] == versions:
+            self.views.move_to_end(key)
+            return self.views[key][1]
+        view = self.make_view(start, end)
+        self.views[key] = (versions, view)
+        self.views.move_to_end(key)
+        while len(self.views) > self.VIEW_CACHE_SIZE:
+            self.views.popitem(last=False)
+        return view
+
+    def make_view(self, start, end) -> 'GroupChat':
+        first = np.searchsorted(self.timestamps, start.to_datetime64(), 'left') if start is not None else 0
+        last = np.searchsorted(self.timestamps, end.to_datetime64(), 'right') if end is not None else len(self.timestamps)
+
+        view = copy(self)
+        view.messages = self.messages.iloc[first:last]
+        view.timestamps = self.timestamps[first:last]
+        if 'post_id' in self.messages:
+            # The range's post_ids are first to last - 1, so its likes are a slice too
+            like_ids = self.likes['post_id'].to_numpy()
+            view.likes = self.likes.iloc[np.searchsorted(like_ids, first, 'left'):np.searchsorted(like_ids, last, 'left')]
+        view.authors = np.asarray(view.messages['author'].unique())
+        view._search_index = None
+        view.cache = {}
+        view.versions = defaultdict(int, self.versions)
+        view.views = OrderedDict()
+        return view
+
+    def cached(self, key: str, columns: list, compute):
+        # Returns compute(), reusing its result from an earlier call with the same key unless any of the columns
+        # it was computed from have changed since
+        if self.is_cached(key, columns):
+            return self.cache[key][1]
+        versions = tuple(self.versions[column] for column in columns)
+        result = compute()
+        self.cache[key] = (versions, result)
+        return result
+
+    def is_cached(self, key: str, columns: list) -> bool:
+        # Returns if cached() has an up to date result for key
+        return key in self.cache and self.cache[key][0] == tuple(self.versions[column] for column in columns)
+
+    def changed(self, *columns):
+        # Marks columns as modified, so cached results computed from them are recomputed
+        for column in columns:
+            self.versions[column] += 1
+
     def __str__(self) -> str:
         return f"GroupChat({self.title})"
 
@@ -39,44 +184,89 @@ class GroupChat:
     def rename_author(self, old_name, new_name):
         # Check if the old name exists in the authors list
         if old_name not in self.authors:
-            print(old_name, self.authors)
             raise ValueError(f'Author "{old_name}" not found in authors list')
 
-        # Rename the author in the messages df
-        self.messages.loc[self.messages['author'] == old_name, 'author'] = new_name
-
-        # Rename the author in the likes df
-        self.likes.loc[self.likes['liker'] == old_name, 'liker'] = new_name
+        # Rename the author in the shared dictionary of the messages and likes dfs
+        self.messages['author'] = rename_category(self.messages['author'], old_name, new_name)
+        self.likes['liker'] = rename_category(self.likes['liker'], old_name, new_name)
 
         # Update the authors list
-        self.authors = self.messages['author'].unique()
+        if new_name in self.authors:
+            self.authors = self.authors[self.authors != old_name]
+        else:
+            self.authors = np.where(self.authors == old_name, new_name, self.authors)
+
+        # Anything derived from the old author names is out of date
+        self.changed('author', 'liker')
+
+        # Update the search index's authors, if it has been built
+        if self._search_index is not None:
+            self._search_index.rename_author(old_name, new_name)
+
+def sort_by_timestamp(messages: pd.DataFrame, likes: pd.DataFrame) -> (pd.DataFrame, pd.DataFrame):
+    # Puts messages in order of their timestamps (keeping the order of messages sent in the same minute), renumbers
+    # their post_ids to match their new positions, and puts the likes in order of post_id.
+    # Parsed chats are usually in order already, in which case nothing is copied.
+    if 'timestamp' in messages and not messages['timestamp'].is_monotonic_increasing:
+        messages = messages.iloc[np.argsort(messages['timestamp'].to_numpy(), kind='stable')].reset_index(drop=True)
+    if 'post_id' not in messages:
+        return messages, likes
+
+    post_ids = messages['post_id'].to_numpy()
+    if not np.array_equal(post_ids, np.arange(len(messages))):
+        likes = likes.assign(post_id=pd.Index(post_ids).get_indexer(likes['post_id']))
+        likes = likes[likes['post_id'] >= 0].astype({'post_id': COLUMN_DTYPES['post_id']}).reset_index(drop=True)  # Drops likes of unknown messages
+        messages = messages.assign(post_id=np.arange(len(messages), dtype=COLUMN_DTYPES['post_id']))
+    if not likes['post_id'].is_monotonic_increasing:
+        likes = likes.iloc[np.argsort(likes['post_id'].to_numpy(), kind='stable')].reset_index(drop=True)
+    return messages, likes
 
 class Message:
+    # Extracts a message's fields from its lxml div in a single walk over the div's elements
     def __init__(self, message_div) -> None:
-        self.author_div = message_div.find('div', class_=HTML_CLASSES['author'])
-        self.author = self.author_div.get_text() if self.author_div else None
-        self.timestamp_div = message_div.find('div', class_=HTML_CLASSES['timestamp'])
-        self.timestamp = self.timestamp_div.get_text() if self.timestamp_div else None
-        self.timestamp = pd.to_datetime(self.timestamp)
-        self.likers_list = message_div.find('ul', class_=HTML_CLASSES['likers'])
-        self.likers = [remove_first_emoji(li.get_text(strip=True)) for li in self.likers_list.find_all('li')] if self.likers_list else []
-        self.content_div = message_div.find('div', class_=HTML_CLASSES['content'])
+        self.author = None
+        self.timestamp = None  # Left as a string, see parse_timestamps
+        self.likers = []
+        content_div = None
+        likers_list = None
+        media = []
+        hrefs = set()
 
+        for element in message_div.iter():
+            tag = element.tag
+            if tag == 'div':
+                classes = element.get('class')
+                if classes == HTML_CLASSES['author'] and self.author is None:
+                    self.author = ''.join(map(collapse_whitespace, element.itertext()))
+                elif classes == HTML_CLASSES['timestamp'] and self.timestamp is None:
+                    self.timestamp = ''.join(element.itertext())
+                elif classes == HTML_CLASSES['content'] and content_div is None:
+                    content_div = element
+            elif tag == 'ul' and likers_list is None and HTML_CLASSES['likers'] in (element.get('class') or '').split():
+                likers_list = element
+            elif tag == 'a':
+                href = element.get('href')
+                if href is not None:
+                    hrefs.add(href)
+            elif tag in ('img', 'audio', 'video'):
+                media.append(element)
+
+        if likers_list is not None:
+            self.likers = [remove_first_emoji(''.join(s.strip() for s in li.itertext())) for li in likers_list.iter('li')]
+
+        # Media only counts if it's inside the content div, and images take priority over audio and video
         self.meta = None
-        if self.content_div and self.content_div.find('img'):
-            self.meta = 'image'
-        elif self.content_div and self.content_div.find('audio'):
-            self.meta = 'audio'
-        elif self.content_div and self.content_div.find('video'):
-            self.meta = 'video'
-
-        self.image = self.content_div.find('img') if self.content_div else None
-        self.audio = self.content_div.find('audio') if self.content_div else None
-        self.video = self.content_div.find('video') if self.content_div else None
-
-        self.content = [x for x in self.content_div.find_all(string=True,recursive=True) if x.parent.name not in ['li', 'a']] if self.content_div and not self.meta else None
-        self.a = message_div.find_all('a')
-        self.links = list(set([a.get('href') for a in self.a])) if self.meta not in ['image', 'audio', 'video'] else []
+        if content_div is not None:
+            media_tags = {element.tag for element in media if content_div in element.iterancestors()}
+            for tag, meta in [('img', 'image'), ('audio', 'audio'), ('video', 'video')]:
+                if tag in media_tags:
+                    self.meta = meta
+                    break
+
+        self.content = None
+        if content_div is not None and not self.meta:
+            self.content = [collapse_whitespace(s) for s in CONTENT_TEXT_XPATH(content_div) if text_parent(s).tag not in ('li', 'a')]
+        self.links = list(hrefs) if self.meta not in ['image', 'audio', 'video'] else []
         if any([x.startswith('https://www.instagram.com') for x in self.links]):
             self.meta = 'post'
             self.content = None
@@ -91,32 +281,150 @@ class Message:
                 self.meta = 'deprecated_like'
                 self.content = None
 
-def parse_html_file(path: str) -> (pd.DataFrame, str):
-    # Parse a single HTML file and return a df of messages and the title of the chat
-    with open(path, encoding='utf8') as f:
-        data = f.read()
-    soup = BeautifulSoup(data, 'lxml')
+def collapse_whitespace(s: str) -> str:
+    # Whitespace-only text (e.g. indentation between tags) is reduced to a single newline or space
+    if s.strip():
+        return s
+    return '\n' if '\n' in s else ' '
 
-    message_divs = soup.find_all('div', class_=HTML_CLASSES['message'])
+def text_parent(s):
+    # Returns the element that directly contains a text node returned by an lxml XPath query
+    return s.getparent().getparent() if s.is_tail else s.getparent()
+
+def message_to_dict(m: Message) -> dict:
+    return {'meta': m.meta,
+            'author': m.author,
+            'timestamp': m.timestamp,
+            'content': m.content,
+            'likers': m.likers}
+
+def parse_timestamps(timestamps: pd.Series) -> pd.Series:
+    # Parses timestamp strings in one vectorized call per known Instagram format, falling back to
+    # pandas' format inference for anything else. Missing or unparseable timestamps become NaT.
+    parsed = pd.Series(pd.NaT, index=timestamps.index, dtype='datetime64[ns]')
+    for fmt in TIMESTAMP_FORMATS + ['mixed']:
+        unparsed = parsed.isna() & timestamps.notna()
+        if not unparsed.any():
+            break
+        parsed[unparsed] = pd.to_datetime(timestamps[unparsed], format=fmt, errors='coerce')
+    return parsed
+
+def messages_to_df(message_dicts: list) -> pd.DataFrame:
+    # Builds a df from message dicts, dropping messages without a valid timestamp
+    df = pd.DataFrame.from_dict(message_dicts)
+    if df.empty:
+        return df
+    df['timestamp'] = parse_timestamps(df['timestamp'])
+    return df[df['timestamp'].notna()].reset_index(drop=True)
+
+def read_title(path: str) -> str:
+    # Reads the chat title from the <head> of an HTML file without parsing the rest of it
+    for _, elem in etree.iterparse(path, events=('end',), tag='title', html=True, encoding='utf8'):
+        return ''.join(elem.itertext())
+    return ''
+
+def stream_html_file(path: str):
+    # Yields one message dict at a time, freeing each message's subtree once it has been processed,
+    # so memory stays bounded by a single message rather than the size of the file.
+    # Timestamps are left as strings to be parsed together afterwards.
+    context = etree.iterparse(path, events=('end',), tag='div', html=True, encoding='utf8')
+    for _, elem in context:
+        if elem.get('class') != HTML_CLASSES['message']:
+            continue
+        d = message_to_dict(Message(elem))
+
+        # Free the processed message and any siblings that came before it
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+        yield d
+    del context
+
+def parse_html_file(path: str, stream: bool = False) -> (pd.DataFrame, str):
+    # Parse a single HTML file and return a df of messages and the title of the chat.
+    # Setting stream to True parses the file incrementally, which keeps memory usage low for large exports.
+    if stream:
+        message_dicts = list(tqdm(stream_html_file(path), desc='Parsing messages', leave=False))
+        return messages_to_df(message_dicts), read_title(path)
+
+    root = etree.parse(path, etree.HTMLParser(encoding='utf8')).getroot()
+    message_divs = [div for div in root.iter('div') if div.get('class') == HTML_CLASSES['message']]
     messages = [Message(m) for m in tqdm(message_divs, desc='Parsing messages', leave=False)]
-    title = soup.find('title').get_text()
-    message_dicts = []
-    for m in messages:
-        d = {'meta': m.meta,
-        'author': m.author,
-        'timestamp': m.timestamp,
-        'content': m.content,
-        'likers': m.likers}
-        message_dicts.append(d)
-    df = pd.DataFrame.from_dict([m for m in message_dicts if not str(m['timestamp']) == 'NaT'])
-    return df, title
-
-def parse_html_folder(path: str = 'data') -> GroupChat:
-    # Parse all HTML files in a folder and return a df of messages, a df of likes, and the title of the chat
+    title = root.find('.//title')
+    title = ''.join(title.itertext()) if title is not None else ''
+    return messages_to_df([message_to_dict(m) for m in messages]), title
+
+def file_hash(path: str) -> str:
+    # Returns a hash of a file's contents, used to detect which HTML files have changed between runs
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_manifest(cache_path: str) -> dict:
+    # Loads the manifest of previously parsed HTML files, mapping file names to their hash and title.
+    # Files parsed by a different PARSER_VERSION (or before the version was stored) are treated as not parsed.
+    manifest_path = f"{cache_path}/manifest.json"
+    if not os_path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding='utf8') as f:
+        manifest = json.load(f)
+    if manifest.get('parser_version') != PARSER_VERSION:
+        return {}
+    return manifest['files']
+
+def save_manifest(manifest: dict, cache_path: str):
+    makedirs(cache_path, exist_ok=True)
+    with open(f"{cache_path}/manifest.json", 'w', encoding='utf8') as f:
+        json.dump({'parser_version': PARSER_VERSION, 'files': manifest}, f, indent=2)
+
+def parse_html_files(paths: list, stream: bool = False, workers: int = None) -> list:
+    # Parses a list of HTML files, concurrently in a process pool with the given number of workers
+    # (defaults to the number of CPUs). Returns (df, title) tuples in the same order as paths.
+    parse = partial(parse_html_file, stream=stream)
+    if workers == 1 or len(paths) <= 1:
+        return [parse(path) for path in tqdm(paths, desc='Parsing HTML files')]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(tqdm(executor.map(parse, paths), total=len(paths), desc='Parsing HTML files'))
+
+def parse_html_folder(path: str = 'data', stream: bool = False, workers: int = None, cache_path: str = None) -> GroupChat:
+    # Parse all HTML files in a folder and return a df of messages, a df of likes, and the title of the chat.
+    # Files are parsed concurrently and the results are kept in numeric file order so the output matches a serial run.
+    # If cache_path is given, each file's parsed df is cached there alongside a manifest of content hashes,
+    # and only new or changed files are parsed on subsequent runs (or every file, if PARSER_VERSION has changed).
     paths = glob.glob(f"{path}/*.html")
     paths = sorted(paths, key = lambda x : int(re.split('\_|\.', x)[-2]))
-    paths = paths[:1]
-    data = [parse_html_file(path) for path in tqdm(paths, desc='Parsing HTML files')]
+
+    if cache_path is None:
+        data = parse_html_files(paths, stream=stream, workers=workers)
+    else:
+        manifest = load_manifest(cache_path)
+        makedirs(f"{cache_path}/cache", exist_ok=True)
+        names = [os_path.basename(p) for p in paths]
+        hashes = [file_hash(p) for p in paths]
+        changed = [i for i, (name, h) in enumerate(zip(names, hashes))
+                   if manifest.get(name, {}).get('hash') != h or not os_path.exists(f"{cache_path}/cache/{name}.pkl")]
+        parsed = dict(zip(changed, parse_html_files([paths[i] for i in changed], stream=stream, workers=workers)))
+
+        data = []
+        new_manifest = {}
+        for i, (name, h) in enumerate(zip(names, hashes)):
+            if i in parsed:
+                df, title = parsed[i]
+                df.to_pickle(f"{cache_path}/cache/{name}.pkl")
+            else:
+                df, title = pd.read_pickle(f"{cache_path}/cache/{name}.pkl"), manifest[name]['title']
+            new_manifest[name] = {'hash': h, 'title': title}
+            data.append((df, title))
+        save_manifest(new_manifest, cache_path)
+        # Drop the cached dfs of HTML files that are gone
+        for cached in listdir(f"{cache_path}/cache"):
+            if cached.endswith('.pkl') and cached[:-len('.pkl')] not in new_manifest:
+                remove(f"{cache_path}/cache/{cached}")
+        print(f"Parsed {len(changed)} new or changed file(s), reused {len(paths) - len(changed)} cached file(s)")
+
     dfs = [d[0] for d in data]
     titles = [d[1] for d in data]
     most_common_title = max(set(titles), key=titles.count)
@@ -134,34 +442,48 @@ def separate_dfs(df):
     messages = df.drop(columns=['likers']).reset_index(drop=True)
     messages['post_id'] = messages.index  # Assign a new post_id based on the index
 
-    like_events_data = []
-    for index, row in tqdm(df.iterrows(), desc='Collecting like event data'):
-        for liker in row['likers']:
-            like_events_data.append({'post_id': index, 'liker': liker})
-
-    like_events = pd.DataFrame(like_events_data)
+    # One like event per (message, liker) pair; messages nobody liked explode to NaN and are dropped
+    likers = df['likers'].explode().dropna()
+    like_events = pd.DataFrame({'post_id': likers.index.to_numpy(dtype=np.int64), 'liker': likers.to_numpy()},
+                               columns=['post_id', 'liker'])
     
     return messages, like_events
 
 
-def make_csvs(groupchat, data_path: str = 'parsed_data'):
-    # Saves groupchat info to CSV files in the data_path folder
+def save_groupchat(groupchat, data_path: str = 'parsed_data', fmt: str = 'parquet'):
+    # Saves groupchat info to the data_path folder, as typed Parquet files by default or as CSV files
+    if fmt not in STORAGE_FORMATS:
+        raise ValueError(f'Unknown storage format "{fmt}", expected one of {STORAGE_FORMATS}')
     makedirs(data_path, exist_ok=True)
-    messages_df = groupchat.messages
-    likes_df = groupchat.likes
-    title = groupchat.title
-    messages_df.to_csv(f"{data_path}/messages.csv")
-    likes_df.to_csv(f"{data_path}/likes.csv")
+    for name, df in [('messages', groupchat.messages), ('likes', groupchat.likes)]:
+        if fmt == 'parquet':
+            apply_dtypes(df).to_parquet(f"{data_path}/{name}.parquet", index=False)
+        else:
+            df.to_csv(f"{data_path}/{name}.csv")
     with open(f"{data_path}/title.txt", 'w') as f:
-        f.write(title)
-    print("CSV files written!")
+        f.write(groupchat.title)
+    print("CSV files written!" if fmt == 'csv' else "Parquet files written!")
+
+def make_csvs(groupchat, data_path: str = 'parsed_data'):
+    # Saves groupchat info to CSV files in the data_path folder
+    save_groupchat(groupchat, data_path, fmt='csv')
+
+def read_table(path: str, name: str, columns: list = None) -> pd.DataFrame:
+    # Reads one of a groupchat's tables, preferring Parquet over CSV if both exist.
+    # If columns is given, only those columns are read.
+    if os_path.exists(f"{path}/{name}.parquet"):
+        return pd.read_parquet(f"{path}/{name}.parquet", columns=columns)
+    usecols = (lambda c: c == 'Unnamed: 0' or c in columns) if columns is not None else None
+    return pd.read_csv(f"{path}/{name}.csv", index_col=0, usecols=usecols)
 
-def load_df(path: str = 'data', dfs: list = ['messages', 'likes']) -> GroupChat:
-    # Loads a groupchat from CSV files, returns a GroupChat object
-    m, l = tuple(pd.read_csv(f"{path}/{df}.csv", index_col=0) for df in dfs)
+def load_df(path: str = 'data', dfs: list = ['messages', 'likes'], columns: dict = None) -> GroupChat:
+    # Loads a groupchat from Parquet or CSV files, returns a GroupChat object.
+    # columns optionally maps a df name to the list of columns to load from it.
+    columns = columns or {}
+    m, l = tuple(read_table(path, df, columns.get(df)) for df in dfs)
     title = open(f"{path}/title.txt").read()
     return GroupChat(m, l, title)
 
 if __name__ == '__main__':
-    groupchat = parse_html_folder()
-    make_csvs(groupchat)
\ No newline at end of file
+    groupchat = parse_html_folder(stream=True, cache_path='parsed_data')
+    save_groupchat(groupchat)
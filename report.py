@@ -0,0 +1,104 @@
+"""
+Headless batch reports: loads one or more parsed chats and writes analysis tables (csv) and graphs (png/svg)
+without starting the GUI, e.g.
+
+    python report.py parsed_data --output reports --words lol,haha --format png svg
+
+Each chat's report is written to a folder named after the chat inside the output folder.
+"""
+import argparse
+import os
+import matplotlib
+matplotlib.use('Agg')  # Never needs a display
+from matplotlib.figure import Figure
+import pandas as pd
+from html_parser import load_df
+from analysis import (messages_per_author, activity_over_time, activity_heatmap_data, generate_author_stats,
+                      count_words_by_author, reply_time_stats, reply_time_histogram, draw_messages_per_user,
+                      draw_activity_over_time, draw_activity_heatmap, draw_reply_times, AUTHOR_STATS_COLUMNS)
+
+ANALYSES = ['stats', 'words', 'activity', 'heatmap', 'replies']
+PERIODS = {'Y': 'Year', 'M': 'Month', 'W': 'Week', 'D': 'Day'}
+
+
+def save_figure(draw, data, path: str, formats: list, **kwargs):
+    # Draws data onto a new figure and saves it in each format, e.g. path.png and path.svg
+    fig = Figure()
+    draw(fig, data, **kwargs)
+    for fmt in formats:
+        fig.savefig(f'{path}.{fmt}', format=fmt)
+
+def write_report(chat_path: str, output_path: str, analyses: list = ANALYSES, columns: list = AUTHOR_STATS_COLUMNS,
+                 words: list = None, whole_word: bool = False, period: str = 'M', by_author: bool = False,
+                 formats: list = ('png',), start=None, end=None):
+    # start and end optionally limit every analysis to the messages sent between them
+    groupchat = load_df(chat_path).between(start, end)
+    os.makedirs(output_path, exist_ok=True)
+
+    def output(name):
+        return os.path.join(output_path, name)
+
+    if 'stats' in analyses:
+        author_stats = generate_author_stats(groupchat, columns)
+        author_stats.to_csv(output('author_stats.csv'))
+        save_figure(draw_messages_per_user, messages_per_author(groupchat), output('messages_per_user'), formats)
+
+    if 'words' in analyses and words:
+        word_counts = count_words_by_author(groupchat, words, whole_word=whole_word)
+        word_counts.to_csv(output('word_counts.csv'), index_label='author')
+
+    if 'activity' in analyses:
+        activity = activity_over_time(groupchat, period)
+        activity.to_csv(output('activity_over_time.csv'))
+        save_figure(draw_activity_over_time, activity, output('activity_over_time'), formats,
+                    authors=None if by_author else 'all')
+
+    if 'heatmap' in analyses:
+        heatmap_data = activity_heatmap_data(groupchat)
+        heatmap_data.to_csv(output('activity_heatmap.csv'))
+        save_figure(draw_activity_heatmap, heatmap_data, output('activity_heatmap'), formats)
+
+    if 'replies' in analyses:
+        reply_stats = reply_time_stats(groupchat)
+        reply_stats.to_csv(output('reply_times.csv'))
+        histogram = reply_time_histogram(groupchat)
+        histogram.to_csv(output('reply_time_histogram.csv'))
+        save_figure(draw_reply_times, reply_stats, output('reply_times'), formats, histogram=histogram)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Write analysis tables and graphs for parsed group chats.')
+    parser.add_argument('chats', nargs='+', help='folders containing parsed chats (see html_parser.py)')
+    parser.add_argument('-o', '--output', default='reports', help='folder to write reports to (default: reports)')
+    parser.add_argument('-a', '--analyses', nargs='+', choices=ANALYSES, default=ANALYSES, help='analyses to run (default: all)')
+    parser.add_argument('--columns', help='comma separated author stats columns (default: all), '
+                                          f'from: {", ".join(AUTHOR_STATS_COLUMNS)}')
+    parser.add_argument('-w', '--words', help='comma separated words to count by author')
+    parser.add_argument('--whole-word', action='store_true', help='only count whole word matches')
+    parser.add_argument('-p', '--period', choices=PERIODS, default='M', help='activity over time period (default: M)')
+    parser.add_argument('--by-author', action='store_true', help='plot activity over time per author rather than in total')
+    parser.add_argument('--start', help='only include messages sent from this date (or time) on, e.g. 2023-01-01')
+    parser.add_argument('--end', help='only include messages sent up to this date (or time), e.g. 2023-06-30')
+    parser.add_argument('-f', '--format', nargs='+', choices=['png', 'svg'], default=['png'], dest='formats',
+                        help='graph formats (default: png)')
+    args = parser.parse_args(args)
+
+    columns = AUTHOR_STATS_COLUMNS
+    if args.columns:
+        columns = [column.strip() for column in args.columns.split(',')]
+        unknown = [column for column in columns if column not in AUTHOR_STATS_COLUMNS]
+        if unknown:
+            parser.error(f'unknown author stats columns: {", ".join(unknown)}')
+    words = [word.strip() for word in args.words.split(',')] if args.words else None
+    start = pd.Timestamp(args.start) if args.start else None
+    end = pd.Timestamp(args.end) if args.end else None
+    if end is not None and end == end.normalize() and ':' not in args.end:
+        end += pd.Timedelta(days=1) - pd.Timedelta(1, 'ns')  # A date on its own includes that whole day
+
+    for chat in args.chats:
+        output_path = os.path.join(args.output, os.path.basename(os.path.normpath(chat)))
+        print(f'Writing report for {chat} to {output_path}')
+        write_report(chat, output_path, args.analyses, columns, words, args.whole_word, args.period, args.by_author, args.formats, start, end)
+
+
+if __name__ == '__main__':
+    main()
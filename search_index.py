@@ -0,0 +1,94 @@
+import re
+from bisect import bisect_left
+import numpy as np
+import pandas as pd
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class MessageIndex:
+    """
+    Inverted index over the content of a messages df, used to search messages without scanning every row.
+
+    Tokens are stored in sorted order with the row positions (not index labels) of the messages containing them,
+    so both whole-word and prefix lookups are a binary search followed by a slice.
+    """
+    def __init__(self, messages: pd.DataFrame) -> None:
+        tokens = pd.Series(messages['content'].fillna('').str.lower().str.findall(TOKEN_PATTERN.pattern).to_numpy())
+        tokens = tokens.explode().dropna()
+
+        # Number tokens by their sorted order, then sort and deduplicate (token, row) pairs as a single integer key
+        codes, self.tokens = pd.factorize(tokens.to_numpy(), sort=True)
+        keys = np.unique(codes.astype(np.int64) * len(messages) + tokens.index.to_numpy(dtype=np.int64))
+        codes, self.rows = np.divmod(keys, len(messages))
+
+        # Tokens are stored like a sparse matrix: the rows for self.tokens[i] are self.rows[self.offsets[i]:self.offsets[i + 1]]
+        self.tokens = self.tokens.tolist()
+        self.offsets = np.searchsorted(codes, np.arange(len(self.tokens) + 1))
+
+        authors = pd.Categorical(messages['author'])
+        self.author_codes = authors.codes
+        self.author_names = list(authors.categories)
+        self.timestamps = pd.to_datetime(messages['timestamp']).to_numpy()
+        self.size = len(messages)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def rename_author(self, old_name, new_name):
+        # Keeps the author filter in sync with GroupChat.rename_author
+        if old_name not in self.author_names:
+            return
+        old_code = self.author_names.index(old_name)
+        if new_name in self.author_names:
+            self.author_codes = np.where(self.author_codes == old_code, self.author_names.index(new_name), self.author_codes)
+        else:
+            self.author_names[old_code] = new_name
+
+    def lookup(self, term: str, prefix: bool = True) -> np.ndarray:
+        # Returns the sorted row positions of messages containing the term, or any token starting with it if prefix is True
+        lo = bisect_left(self.tokens, term)
+        if prefix:
+            hi = bisect_left(self.tokens, term + '\U0010ffff', lo)
+        else:
+            hi = lo + 1 if lo < len(self.tokens) and self.tokens[lo] == term else lo
+        rows = self.rows[self.offsets[lo]:self.offsets[hi]]
+        if hi - lo <= 1:
+            return rows
+        # Several tokens match the prefix, so merge their rows with a mask rather than sorting them
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return np.flatnonzero(mask)
+
+    def search(self, query: str, authors: list = None, start=None, end=None, prefix: bool = True) -> np.ndarray:
+        """
+        Returns the sorted row positions of messages matching the query.
+
+        Words in the query must all appear in a message (AND), and groups of words can be separated by "OR",
+        e.g. "pizza tonight OR burgers". Each word also matches longer words starting with it unless prefix is False.
+        Results can be limited to messages from the given authors, and to messages sent between start and end.
+        """
+        result = None
+        for group in re.split(r'\s+OR\s+', query.strip()):
+            terms = tokenize(group)
+            if not terms:
+                continue
+            rows = self.lookup(terms[0], prefix)
+            for term in terms[1:]:
+                rows = np.intersect1d(rows, self.lookup(term, prefix), assume_unique=True)
+            result = rows if result is None else np.union1d(result, rows)
+        if result is None:
+            result = np.arange(self.size)
+
+        if authors is not None:
+            codes = [self.author_names.index(a) for a in authors if a in self.author_names]
+            result = result[np.isin(self.author_codes[result], codes)]
+        if start is not None:
+            result = result[self.timestamps[result] >= np.datetime64(pd.Timestamp(start))]
+        if end is not None:
+            result = result[self.timestamps[result] <= np.datetime64(pd.Timestamp(end))]
+        return result
@@ -0,0 +1,24 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from html_parser import GroupChat
+
+
+def groupchat_from(authors: list, contents: list = None, minutes: list = None) -> GroupChat:
+    # A groupchat of text messages from authors, sent a minute apart unless minutes (since the first message) is given
+    n = len(authors)
+    start = pd.Timestamp('2023-01-01 09:00')
+    messages = pd.DataFrame({'author': pd.Series(authors, dtype=object),
+                             'timestamp': [start + pd.Timedelta(minutes=m) for m in (minutes or range(n))],
+                             'meta': ['message'] * n,
+                             'content': contents if contents is not None else [''] * n,
+                             'post_id': range(n)})
+    likes = pd.DataFrame({'post_id': pd.Series([], dtype='int32'), 'liker': pd.Series([], dtype=object)})
+    return GroupChat(messages, likes, 'Test Chat')
+
+@pytest.fixture
+def make_groupchat():
+    return groupchat_from
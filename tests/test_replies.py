@@ -0,0 +1,29 @@
+import pytest
+from analysis import make_reply_matrix, reply_time_stats, generate_author_stats
+
+
+def test_reply_matrix(make_groupchat):
+    groupchat = make_groupchat(['Ann', 'Ben', 'Ben', 'Ann', 'Cat', 'Ann'])
+    matrix = make_reply_matrix(groupchat)
+    assert matrix.loc['Ann'].to_dict() == {'Ann': 0, 'Ben': 1, 'Cat': 1}
+    assert matrix.loc['Ben', 'Ann'] == 1 and matrix.loc['Cat', 'Ann'] == 1
+    assert matrix.to_numpy().sum() == 4
+
+def test_reply_times(make_groupchat):
+    groupchat = make_groupchat(['Ann', 'Ben', 'Ann', 'Ben', 'Ann'], minutes=[0, 2, 3, 10, 30])
+    stats = reply_time_stats(groupchat, percentiles=[0.5])
+    assert stats.loc[('Ann', 'Ben')].tolist() == [2, 4.5]  # Replies after 2 and 7 minutes
+    assert stats.loc[('Ben', 'Ann')].tolist() == [2, 10.5]  # Replies after 1 and 20 minutes
+    author_stats = generate_author_stats(groupchat, ['Replies sent', 'Median reply time'])
+    assert author_stats.loc['Ben'].tolist() == [2, 4.5]
+
+@pytest.mark.parametrize('authors, replies', [(['Ann', None, 'Ben', 'Ann'], 1), ([None], 0), ([None, 'Ann'], 0),
+                                              (['Ann', None], 0), (['Ann', 'Ben', None, 'Ann', 'Ben'], 2)])
+def test_missing_authors(make_groupchat, authors, replies):
+    # Messages without an author are skipped, and break up the replies around them
+    groupchat = make_groupchat(authors)
+    matrix = make_reply_matrix(groupchat)
+    assert list(matrix.index) == [a for a in dict.fromkeys(authors) if a is not None]
+    stats = reply_time_stats(groupchat)
+    assert stats['replies'].sum() == matrix.to_numpy().sum() == replies
+    generate_author_stats(groupchat, ['Replies sent', 'Median reply time'])
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import make_runs_data
+
+
+def reference_runs_data(groupchat) -> dict:
+    # The iterrows loop make_runs_data replaced
+    m = groupchat.messages
+    runs_data = {}
+    previous_author = None
+    current_run_length = 0
+
+    for index, row in m.iterrows():
+        author = row['author']
+        if author == previous_author:
+            current_run_length += 1
+        else:
+            if previous_author is not None:
+                if previous_author not in runs_data:
+                    runs_data[previous_author] = {'total_runs': 0, 'total_messages_in_runs': 0, 'longest_run': 0}
+
+                runs_data[previous_author]['total_runs'] += 1
+                runs_data[previous_author]['total_messages_in_runs'] += current_run_length
+                runs_data[previous_author]['longest_run'] = max(runs_data[previous_author]['longest_run'], current_run_length)
+
+            previous_author = author
+            current_run_length = 1
+
+    # Adding the last author's run data
+    if previous_author is not None:
+        if previous_author not in runs_data:
+            runs_data[previous_author] = {'total_runs': 0, 'total_messages_in_runs': 0, 'longest_run': 0}
+
+        runs_data[previous_author]['total_runs'] += 1
+        runs_data[previous_author]['total_messages_in_runs'] += current_run_length
+        runs_data[previous_author]['longest_run'] = max(runs_data[previous_author]['longest_run'], current_run_length)
+
+    for author in runs_data:
+        runs_data[author]['average_run_length'] = runs_data[author]['total_messages_in_runs'] / runs_data[author]['total_runs']
+
+    return runs_data
+
+def expected_runs_data(groupchat) -> dict:
+    # The loop kept messages without an author as runs of their own under a NaN key. make_runs_data leaves them out,
+    # though they still end the runs around them.
+    return {author: data for author, data in reference_runs_data(groupchat).items() if not pd.isna(author)}
+
+def assert_same_runs(groupchat):
+    result = make_runs_data(groupchat)
+    expected = expected_runs_data(groupchat)
+    assert result == expected
+    assert list(result) == list(expected)  # Authors in the same order, by their first run
+
+@pytest.mark.parametrize('authors', [[], ['Ann'], ['Ann', 'Ann'], ['Ann', 'Ben']])
+def test_short_chats(make_groupchat, authors):
+    assert_same_runs(make_groupchat(authors))
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_authors(make_groupchat, seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 300))
+    # Few authors and a bias towards repeating the last one, so there are long runs
+    authors = [str(rng.choice(['Ann', 'Ben', 'Cat', 'Dan']))]
+    for _ in range(n - 1):
+        authors.append(authors[-1] if rng.random() < 0.6 else str(rng.choice(['Ann', 'Ben', 'Cat', 'Dan'])))
+    assert_same_runs(make_groupchat(authors))
+
+@pytest.mark.parametrize('authors', [[None], ['Ann', None, 'Ann'], [None, None, 'Ben', 'Ben'], ['Ann', 'Ann', None]])
+def test_missing_authors(make_groupchat, authors):
+    assert_same_runs(make_groupchat(authors))
+
+def test_missing_authors_end_runs(make_groupchat):
+    assert make_runs_data(make_groupchat(['Ann', None, 'Ann']))['Ann']['total_runs'] == 2
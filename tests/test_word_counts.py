@@ -0,0 +1,52 @@
+import itertools
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import count_words_by_author
+
+CONTENTS = ['abc', 'Hello there, hell is hot', 'he said abc ab a', 'nothing', None, 'HELLO hello abcabc',
+            'a b c ab bc abc', 'lol haha lolol']
+
+
+def reference_counts(groupchat, words) -> pd.DataFrame:
+    # The per-word str.count loop count_words_by_author replaced
+    m = groupchat.messages
+    lower = m['content'].fillna('').str.lower()
+    counts = pd.DataFrame(0, index=m['author'].unique(), columns=words)
+    for word in words:
+        per_author = lower.str.count(re.escape(word.lower())).groupby(m['author'], observed=True).sum()
+        counts[word] = counts.index.map(per_author).fillna(0).astype(int)
+    return counts
+
+@pytest.mark.parametrize('words', list(itertools.permutations(['a', 'ab', 'abc'])))
+def test_nested_terms_counted_once_in_any_order(make_groupchat, words):
+    groupchat = make_groupchat(['Ann'], ['abc'])
+    counts = count_words_by_author(groupchat, list(words))
+    assert counts.loc['Ann'].to_dict() == {'a': 1, 'ab': 1, 'abc': 1}
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_per_word_loop(make_groupchat, seed):
+    rng = np.random.default_rng(seed)
+    words = ['a', 'ab', 'abc', 'he', 'hell', 'hello', 'lol', 'there']
+    rng.shuffle(words)
+    authors = list(rng.choice(['Ann', 'Ben', 'Cat'], len(CONTENTS)))
+    groupchat = make_groupchat(authors, CONTENTS)
+    pd.testing.assert_frame_equal(count_words_by_author(groupchat, words), reference_counts(groupchat, words),
+                                  check_dtype=False)
+
+def test_straddling_terms(make_groupchat):
+    # Terms overlapping without one containing the other
+    groupchat = make_groupchat(['Ann', 'Ann'], ['here there', 'abc aba'])
+    counts = count_words_by_author(groupchat, ['he', 'ere', 'ab', 'bc', 'ba'])
+    assert counts.loc['Ann'].to_dict() == {'he': 2, 'ere': 2, 'ab': 2, 'bc': 1, 'ba': 1}
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_overlapping_terms(make_groupchat, seed):
+    # Short terms over a small alphabet overlap each other, and themselves (e.g. "aba" in "ababa"), all the time
+    rng = np.random.default_rng(seed)
+    contents = [''.join(rng.choice(list('ab '), int(rng.integers(0, 40)))) for _ in range(10)]
+    words = list({''.join(rng.choice(list('ab'), int(rng.integers(1, 5)))) for _ in range(6)})
+    groupchat = make_groupchat(list(rng.choice(['Ann', 'Ben'], len(contents))), contents)
+    pd.testing.assert_frame_equal(count_words_by_author(groupchat, words), reference_counts(groupchat, words),
+                                  check_dtype=False)